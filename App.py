@@ -5,136 +5,244 @@ Grant Eligibility RAG System with Flask API - Updated with Proposal Generation
 
 import os
 import json
+import pickle
 import re
-from flask import Flask, request, jsonify, send_from_directory
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-import requests
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+import faiss
+from ollama_router import OllamaRouter, parse_backends
+from grant_documents import (LEGACY_PIPELINE, compact_rendered_grant, load_grants, pipeline_settings, process_grants,
+                             split_grant_documents)
+from llm_cache import LLMCache, make_key
+from query_cache import LRUCache, QueryCaches, SemanticCache, normalize_query
+from single_flight import SingleFlight
+from job_queue import FINISHED, JobQueue, JobStore, QueueFull
+from proposal_sections import (assemble_proposal, build_section_prompt, find_section, generate_sections,
+                               proposal_sections)
+from grant_insights import drop_insights, insights_path, load_insights, precompute_insights
+from grant_rules import agreement_report, classify_grant, parse_rendered_grant
+from eligibility_engine import EligibilityIndex
+from grant_snapshot import GrantSnapshot, build_snapshot, load_snapshot
+from grant_filters import FILTER_FIELDS, MetadataIndex, documents_at, search_positions, search_positions_batch
+from grant_aggregation import ChunkMap, distance_to_similarity, initial_fetch, search_distinct_grants
+from sparse_index import BM25Index, reciprocal_rank_fusion
+from ann_index import build_faiss_index, configure_search, describe_index
+from warmup import Warmup
+from sqlite_docstore import DOCSTORE_FILE, SQLiteDocstore, SQLitePositionMap, load_docstore, write_docstore
+from index_sync import build_manifest, load_manifest, save_manifest, sync_index
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='./build')
 CORS(app)  # Enable CORS for all routes
 
 # Constants for Ollama API
-OLLAMA_API = "http://localhost:11434/api/chat"
-HEADERS = {"Content-Type": "application/json"}
-MODEL = "llama3.2"
+OLLAMA_API = os.environ.get("OLLAMA_API", "http://localhost:11434/api/chat")
+MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2")
+
+# Models per task: short classification calls can go to a smaller model, proposals to a larger one
+CLASSIFY_MODEL = os.environ.get("OLLAMA_CLASSIFY_MODEL", MODEL)
+PROPOSAL_MODEL = os.environ.get("OLLAMA_PROPOSAL_MODEL", MODEL)
+
+# Shared Ollama router: balances over OLLAMA_BACKENDS ("url[*weight],..."), each backend with a pooled,
+# timeout-aware client; a single backend behaves like a plain client
+ollama_client = OllamaRouter(
+    parse_backends(os.environ.get("OLLAMA_BACKENDS", OLLAMA_API)),
+    MODEL,
+    strategy=os.environ.get("OLLAMA_BALANCING", "least_outstanding"),
+    eject_after=int(os.environ.get("OLLAMA_EJECT_AFTER", 3)),
+    health_interval=float(os.environ.get("OLLAMA_HEALTH_INTERVAL", 10)),
+    pool_size=int(os.environ.get("OLLAMA_POOL_SIZE", 10)),
+    connect_timeout=float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", 3.05)),
+    read_timeout=float(os.environ.get("OLLAMA_READ_TIMEOUT", 120)),
+    max_concurrency=int(os.environ.get("OLLAMA_MAX_CONCURRENCY", 4)),
+    queue_timeout=float(os.environ.get("OLLAMA_QUEUE_TIMEOUT", 30)),
+    max_retries=int(os.environ.get("OLLAMA_MAX_RETRIES", 3))
+)
+
+# Bump whenever a prompt template changes so stale cached generations are not reused
+PROMPT_TEMPLATE_VERSION = 1
+
+# Persistent cache of LLM generations, shareable across server processes
+llm_cache = LLMCache(
+    os.environ.get("LLM_CACHE_PATH", "llm_cache.sqlite3"),
+    ttl=float(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600)),
+    max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+) if os.environ.get("LLM_CACHE_ENABLED", "1") != "0" else None
+
+# Concurrent requests for the same prompt share one upstream generation
+single_flight = SingleFlight(enabled=os.environ.get("LLM_COALESCE", "1") != "0")
+
+# In-memory caches of query embeddings, search results and answers to similar questions; size 0 disables one
+query_cache = QueryCaches(
+    embeddings=LRUCache(
+        int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", 4096)),
+        max_bytes=int(os.environ.get("QUERY_EMBEDDING_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+    ),
+    results=LRUCache(
+        int(os.environ.get("SEARCH_CACHE_SIZE", 1024)),
+        max_bytes=int(os.environ.get("SEARCH_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    ),
+    answers=SemanticCache(
+        threshold=float(os.environ.get("ANSWER_CACHE_THRESHOLD", 0.95)),
+        max_entries=int(os.environ.get("ANSWER_CACHE_SIZE", 512)),
+        max_bytes=int(os.environ.get("ANSWER_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+    )
+)
+
+# Background jobs for long generations; records and results persist across restarts
+job_queue = JobQueue(
+    JobStore(os.environ.get("JOB_STORE_PATH", "jobs.sqlite3")),
+    workers=int(os.environ.get("JOB_WORKERS", 2)),
+    max_queued=int(os.environ.get("JOB_QUEUE_LIMIT", 100)),
+    retention=float(os.environ.get("JOB_RETENTION", 7 * 24 * 3600))
+)
+
+# Concurrent LLM calls for one section-parallel proposal; by default no more than the backends run at once,
+# so sections do not wait out OLLAMA_QUEUE_TIMEOUT for a generation slot and fail as busy
+PROPOSAL_SECTION_WORKERS = int(os.environ.get("PROPOSAL_SECTION_WORKERS", ollama_client.max_concurrency))
+
+# Section calls of every proposal in progress (requests and jobs alike) share these workers, so
+# concurrent proposals queue here rather than oversubscribing the LLM's generation slots
+section_executor = ThreadPoolExecutor(max_workers=PROPOSAL_SECTION_WORKERS, thread_name_prefix="proposal-section")
+
+# Longest a job stream waits between checks for output from other processes
+JOB_POLL_SECONDS = 1.0
 
 # Path to your grants JSON file
 grants_file = "grantss.json"
 
-# Load grants data with error handling
-def load_grants(file_path):
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            content = re.sub(r'[\x00-\x1F\x7F]', '', content)
-            grants = json.loads(content)
-        return grants
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-        print(f"Error occurred near position {e.pos}")
-        
-        # Create a minimal sample to continue
-        print("Creating a minimal sample to continue...")
-        return [json.loads('''
-        {
-            "program_id": 1,
-            "program_name": "Alberta Made Production Grant",
-            "program_source": "Alberta Media Fund",
-            "description": "Sample grant description",
-            "program_status": "Closed",
-            "main_industry": "Art Entertainment and Recreation",
-            "location": "Alberta",
-            "country": "Canada",
-            "target_audience": "NGO, Educational Institution and Researcher, Senior"
-        }
-        ''')]
-
-# Process grants and create documents
-def process_grants(grants):
-    documents = []
-    for grant in grants:
-        # Create a comprehensive text representation of the grant
-        grant_text = f"""
-        Program Name: {grant.get('program_name', '')}
-        Program Source: {grant.get('program_source', '')}
-        Program Type: {grant.get('program_type', '')}
-        Program Target: {grant.get('program_target', '')}
-        Description: {grant.get('description', '')}
-        Program Status: {grant.get('program_status', '')}
-        Main Industry: {grant.get('main_industry', '')}
-        Location: {grant.get('location', '')}
-        Country: {grant.get('country', '')}
-        Min Employees: {grant.get('min_employees', '')}
-        Max Employees: {grant.get('max_employees', '')}
-        Min Revenue: {grant.get('min_revenue', '')}
-        Max Revenue: {grant.get('max_revenue', '')}
-        Target Audience: {grant.get('target_audience', '')}
-        Open Date: {grant.get('open_date', '')}
-        Close Date: {grant.get('close_date', '')}
-        Min Funding: {grant.get('min_funding', '')}
-        Max Funding: {grant.get('max_funding', '')}
-        Amount: {grant.get('amount', '')}
-        Unit: {grant.get('unit', '')}
-        Selling Internationally: {grant.get('selling_internationally', '')}
-        Incorporated: {grant.get('incorporated', '')}
-        For Profit: {grant.get('for_profit', '')}
-        Indigenous Group: {grant.get('indigenous_group', '')}
-        URL: {grant.get('url', '')}
-        """
-        
-        # Create a document with metadata
-        doc = Document(
-            page_content=grant_text,
-            metadata={
-                "program_id": grant.get('program_id', ''),
-                "program_name": grant.get('program_name', ''),
-                "program_status": grant.get('program_status', ''),
-                "location": grant.get('location', ''),
-                "country": grant.get('country', ''),
-                "target_audience": grant.get('target_audience', ''),
-                "main_industry": grant.get('main_industry', '')
-            }
-        )
-        documents.append(doc)
-    
-    return documents
+# "background" binds immediately and warms up on a thread, "lazy" loads each
+# component on first use, "eager" loads everything before serving
+STARTUP_MODE = os.environ.get("STARTUP_MODE", "background")
+
+# Registry of heavy components (grants, embedding model, indexes) loaded lazily or in the background
+warmup = Warmup()
+
+# Directory holding the FAISS index and the artifacts built alongside it
+INDEX_PATH = "grants_faiss_index"
+
+# FAISS index type ("flat", "hnsw", "ivf_flat" or "ivf_pq") and its tuning knobs
+FAISS_INDEX_TYPE = os.environ.get("FAISS_INDEX_TYPE", "flat")
+FAISS_NLIST = int(os.environ.get("FAISS_NLIST", 0)) or None
+FAISS_NPROBE = int(os.environ.get("FAISS_NPROBE", 16))
+FAISS_HNSW_M = int(os.environ.get("FAISS_HNSW_M", 32))
+FAISS_EF_SEARCH = int(os.environ.get("FAISS_EF_SEARCH", 64))
+FAISS_PQ_M = int(os.environ.get("FAISS_PQ_M", 0)) or None
+
+# "sqlite" stores chunks in a SQLite docstore read on demand; "pickle" keeps LangChain's index.pkl
+DOCSTORE_BACKEND = os.environ.get("DOCSTORE_BACKEND", "sqlite")
+
+# Returned by ollama_generate when the LLM call fails
+GENERATION_ERROR = "Error generating response"
+
+# "combined" asks for grant type and eligibility points in one JSON reply; "two_step" uses separate calls
+ELIGIBILITY_MODE = os.environ.get("ELIGIBILITY_MODE", "combined")
+
+# JSON schema passed to Ollama's structured output for the combined eligibility call
+ELIGIBILITY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "grant_type": {"type": "string", "enum": ["COMPANY", "INDIVIDUAL"]},
+        "eligibility_points": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["grant_type", "eligibility_points"]
+}
 
 # Split documents into chunks for better retrieval
 def split_documents(documents):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-    )
-    docs = text_splitter.split_documents(documents)
+    docs = split_grant_documents(documents)
     print(f'# of Grants: {len(documents)}')
     print(f'# of Document Chunks: {len(docs)}')
     return docs
 
 # Create vector database from documents
 def create_vector_db(docs):
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    db = FAISS.from_documents(docs, embeddings)
+    if FAISS_INDEX_TYPE == "flat":
+        db = FAISS.from_documents(docs, embeddings)
+        return db
+
+    # Approximate indexes are built directly in FAISS and wrapped in a LangChain store
+    print(f"Building {FAISS_INDEX_TYPE} index...")
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in docs]), dtype=np.float32)
+    index = build_faiss_index(
+        vectors,
+        FAISS_INDEX_TYPE,
+        nlist=FAISS_NLIST,
+        pq_m=FAISS_PQ_M,
+        hnsw_m=FAISS_HNSW_M,
+        nprobe=FAISS_NPROBE,
+        ef_search=FAISS_EF_SEARCH
+    )
+    doc_ids = [str(uuid.uuid4()) for _ in docs]
+    db = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(doc_ids, docs))),
+        index_to_docstore_id=dict(enumerate(doc_ids))
+    )
     return db
 
 # Save FAISS index to disk
-def save_faiss_index(db, index_path="grants_faiss_index"):
+def save_faiss_index(db, index_path=INDEX_PATH):
     print(f"Saving FAISS index to {index_path}...")
-    db.save_local(index_path)
+    if DOCSTORE_BACKEND == "sqlite":
+        os.makedirs(index_path, exist_ok=True)
+        # Swap the file in whole: a running server may have the old one memory-mapped
+        faiss.write_index(db.index, os.path.join(index_path, "index.faiss.tmp"))
+        os.replace(os.path.join(index_path, "index.faiss.tmp"), os.path.join(index_path, "index.faiss"))
+        write_docstore(os.path.join(index_path, DOCSTORE_FILE), db.index_to_docstore_id, db.docstore)
+    else:
+        db.save_local(index_path)
     print("Index saved successfully!")
 
 # Load FAISS index from disk
-def load_faiss_index(embeddings, index_path="grants_faiss_index"):
+def load_faiss_index(embeddings, index_path=INDEX_PATH, writable=False):
+    """
+    Load the saved index without touching the embedding model.
+
+    The vectors are memory-mapped read-only where this FAISS build supports
+    it, so pages are shared between workers and faulted in on demand. A
+    ``writable`` load (for syncing) reads the vectors into memory and
+    works on a copy of the SQLite docstore, so the files a running server
+    has open are only replaced once the new ones are complete.
+    """
     try:
         if os.path.exists(index_path):
             print(f"Loading existing FAISS index from {index_path}...")
-            # Add the allow_dangerous_deserialization parameter
-            db = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
-            print("Index loaded successfully!")
+            index_file = os.path.join(index_path, "index.faiss")
+            index = faiss.read_index(index_file) if writable else read_faiss_index(index_file)
+            stored = load_docstore(index_path)
+            if stored is not None and writable:
+                working_path = os.path.join(index_path, DOCSTORE_FILE + ".sync")
+                shutil.copyfile(os.path.join(index_path, DOCSTORE_FILE), working_path)
+                docstore = SQLiteDocstore(working_path)
+                index_to_docstore_id = SQLitePositionMap(docstore)
+            elif stored is not None:
+                docstore, index_to_docstore_id = stored
+            else:
+                # Legacy layout: LangChain's save_local pickles (docstore, index_to_docstore_id)
+                print("Loading pickled docstore; run 'python sqlite_docstore.py' to convert it")
+                with open(os.path.join(index_path, "index.pkl"), "rb") as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+            db = FAISS(
+                embedding_function=embeddings,
+                index=index,
+                docstore=docstore,
+                index_to_docstore_id=index_to_docstore_id
+            )
+            # Search-time accuracy knobs are not persisted with the index
+            configure_search(db.index, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH)
+            print(f"Index loaded successfully! {describe_index(db.index)}")
             return db
         else:
             print(f"No existing index found at {index_path}")
@@ -142,31 +250,148 @@ def load_faiss_index(embeddings, index_path="grants_faiss_index"):
     except Exception as e:
         print(f"Error loading index: {e}")
         return None
-    except Exception as e:
-        print(f"Error loading index: {e}")
-        return None
+
+# Read a FAISS index file, memory-mapped when supported
+def read_faiss_index(path):
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if mmap_flag is not None:
+        try:
+            return faiss.read_index(path, mmap_flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError as e:
+            print(f"Memory-mapped read not supported for this index, reading into memory: {e}")
+    return faiss.read_index(path)
+
+# Cache key for a prompt sent to a model (default: the configured one)
+def prompt_cache_key(prompt, format=None, model=None):
+    if format is None:
+        return make_key(model or MODEL, PROMPT_TEMPLATE_VERSION, prompt)
+    return make_key(model or MODEL, PROMPT_TEMPLATE_VERSION, prompt, format=format)
 
 # Call Ollama API directly for text generation
-def ollama_generate(prompt):
-    messages = [
-        {"role": "user", "content": prompt}
-    ]
-    
-    payload = {
-        "model": MODEL,
-        "messages": messages,
-        "stream": False
-    }
-    
+def ollama_generate(prompt, format=None, refresh=False, model=None):
+    """
+    Generate a reply for a prompt. ``format`` is passed through to Ollama
+    ("json" or a JSON schema) to constrain the output. ``refresh`` skips
+    the cached reply; the new one replaces it. ``model`` overrides the
+    default model and routes to the backends serving it.
+    """
+    key = prompt_cache_key(prompt, format, model)
+    if llm_cache is not None and not refresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    # Cached inside the shared call, so a caller arriving just after it finishes hits the cache
+    def generate():
+        response = ollama_client.generate(prompt, model, format=format)
+        if llm_cache is not None:
+            llm_cache.set(key, response)
+        return response
+
     try:
-        response = requests.post(OLLAMA_API, json=payload, headers=HEADERS)
-        return response.json()['message']['content']
+        return single_flight.do(key, generate)
     except Exception as e:
         print(f"Error calling Ollama API: {e}")
-        return "Error generating response"
+        return GENERATION_ERROR
+
+# Call Ollama API in streaming mode, yielding content chunks as they arrive
+def ollama_generate_stream(prompt, stats=None, model=None):
+    """
+    Stream a chat completion from Ollama, yielding each content chunk.
+
+    If a ``stats`` dict is given it is filled with timing and token counts
+    once the final chunk arrives. Cached generations are replayed as a
+    single chunk.
+    """
+    started = time.perf_counter()
+    first_token_at = None
+
+    key = prompt_cache_key(prompt, model=model)
+    if llm_cache is not None:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            if stats is not None:
+                stats.update(generation_stats({}, started, time.perf_counter()))
+                stats['cached'] = True
+            yield cached
+            return
+
+    # Identical prompts streaming at the same time share one upstream stream
+    parts = []
+    for chunk in single_flight.stream(key, lambda: ollama_client.stream(prompt, model)):
+        content = chunk.get('message', {}).get('content', '')
+        if content:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.append(content)
+            yield content
+
+        if chunk.get('done'):
+            if stats is not None:
+                stats.update(generation_stats(chunk, started, first_token_at))
+            # Only complete generations are cached
+            if llm_cache is not None:
+                llm_cache.set(key, "".join(parts))
+
+# Summarize timing and token counts for a finished streaming generation
+def generation_stats(final_chunk, started, first_token_at):
+    elapsed = time.perf_counter() - started
+    eval_count = final_chunk.get('eval_count', 0)
+    # Ollama reports durations in nanoseconds
+    eval_duration = final_chunk.get('eval_duration', 0) / 1e9
+
+    return {
+        'time_to_first_token_ms': round((first_token_at - started) * 1000, 1) if first_token_at else None,
+        'total_time_ms': round(elapsed * 1000, 1),
+        'prompt_tokens': final_chunk.get('prompt_eval_count', 0),
+        'completion_tokens': eval_count,
+        'tokens_per_second': round(eval_count / eval_duration, 2) if eval_duration else None
+    }
+
+# Format a single Server-Sent Event
+def sse_event(data, event=None):
+    message = ""
+    if event:
+        message += f"event: {event}\n"
+    message += f"data: {json.dumps(data)}\n\n"
+    return message
+
+# Wrap a generator of SSE messages in a streaming Flask response
+def sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Stream token chunks for a prompt as SSE, followed by a final stats event
+def stream_generation(prompt, extra=None, model=None):
+    stats = {}
+    try:
+        for content in ollama_generate_stream(prompt, stats, model):
+            yield sse_event({'content': content}, event='token')
+    except Exception as e:
+        print(f"Error streaming from Ollama API: {e}")
+        yield sse_event({'error': str(e)}, event='error')
+        return
+
+    done = dict(extra or {})
+    done['stats'] = stats
+    yield sse_event(done, event='done')
 
 # Determine if a grant is intended for companies/organizations or individuals
 def determine_grant_type(grant_content):
+    """
+    Classify the grant from its structured fields when the signals are clear,
+    falling back to the LLM for ambiguous grants.
+    """
+    grant_type = classify_grant(parse_rendered_grant(grant_content))
+    if grant_type is not None:
+        return grant_type
+    return llm_grant_type(grant_content)
+
+# Ask the LLM whether a grant is intended for companies/organizations or individuals
+def llm_grant_type(grant_content):
     """
     Use the LLM to determine if a grant is intended for companies/organizations 
     or for individuals based on its content.
@@ -184,7 +409,7 @@ def determine_grant_type(grant_content):
     ------------------
     """
     
-    response = ollama_generate(prompt).strip()
+    response = ollama_generate(prompt, model=CLASSIFY_MODEL).strip()
     
     # Normalize the response
     if "company" in response.lower() or "organization" in response.lower():
@@ -195,12 +420,81 @@ def determine_grant_type(grant_content):
         # Default to company if unclear
         return "COMPANY"
 
-# Generate eligibility questions for a grant using Ollama API
-def extract_eligibility_points(grant_doc, grant_type):
+# Determine grant type and extract eligibility points with one structured LLM call
+def analyze_eligibility(grant_content):
     """
-    Extract key eligibility requirements from grant information
-    based on the grant type (company or individual).
+    Ask the LLM for the grant type and eligibility points in a single JSON
+    reply. Falls back to the two-step determine_grant_type +
+    extract_eligibility_points path if the structured reply is unusable
+    or ELIGIBILITY_MODE is "two_step". Grants the rule-based classifier
+    can type on its own skip straight to extract_eligibility_points.
+
+    Returns (grant_type, eligibility_points) with eligibility_points as a
+    bulleted string, matching the two-step output.
     """
+    # Clear-cut grants only need the eligibility call
+    grant_type = classify_grant(parse_rendered_grant(grant_content))
+    if grant_type is not None:
+        doc = Document(page_content=grant_content)
+        return grant_type, extract_eligibility_points(doc, grant_type)
+
+    if ELIGIBILITY_MODE == "combined":
+        prompt = f"""
+        You are a grant eligibility expert. Analyze the grant information below.
+
+        1. Decide whether this grant is primarily intended for companies/organizations ("COMPANY")
+           or for individuals ("INDIVIDUAL").
+        2. Extract the key eligibility requirements an applicant of that type must meet, such as
+           size, revenue, years in operation, industry, legal structure, location, age, education,
+           experience, residency or previous funding limitations.
+           Only include criteria the grant information actually specifies. Each point should be clear and concise.
+
+        Respond with a JSON object of the form:
+        {{"grant_type": "COMPANY" or "INDIVIDUAL", "eligibility_points": ["...", "..."]}}
+
+        Grant Information:
+        ------------------
+        {grant_content}
+        ------------------
+        """
+
+        parsed = parse_eligibility_json(ollama_generate(prompt, format=ELIGIBILITY_SCHEMA, model=CLASSIFY_MODEL))
+        if parsed is not None:
+            grant_type, points = parsed
+            return grant_type, "\n".join(f"- {point}" for point in points)
+
+        print("Structured eligibility reply was invalid, falling back to two LLM calls")
+
+    grant_type = determine_grant_type(grant_content)
+    doc = Document(page_content=grant_content)
+    return grant_type, extract_eligibility_points(doc, grant_type)
+
+# Validate a structured eligibility reply, returning (grant_type, points) or None
+def parse_eligibility_json(response):
+    try:
+        data = json.loads(response)
+    except (TypeError, ValueError):
+        return None
+
+    if not isinstance(data, dict):
+        return None
+
+    grant_type = str(data.get('grant_type', '')).strip().upper()
+    if grant_type not in ("COMPANY", "INDIVIDUAL"):
+        return None
+
+    points = data.get('eligibility_points')
+    if not isinstance(points, list):
+        return None
+    points = [str(point).strip().lstrip("-*• ").strip() for point in points]
+    points = [point for point in points if point]
+    if not points:
+        return None
+
+    return grant_type, points
+
+# Build the eligibility extraction prompt for a grant
+def build_eligibility_prompt(grant_doc, grant_type):
     if grant_type == "COMPANY":
         prompt = f"""
         You are a grant eligibility expert. Based on the grant information provided, extract the key eligibility requirements 
@@ -253,25 +547,64 @@ def extract_eligibility_points(grant_doc, grant_type):
         Key eligibility requirements for individuals:
         """
     
-    return ollama_generate(prompt)
+    return prompt
+
+# Generate eligibility questions for a grant using Ollama API
+def extract_eligibility_points(grant_doc, grant_type):
+    """
+    Extract key eligibility requirements from grant information
+    based on the grant type (company or individual).
+    """
+    return ollama_generate(build_eligibility_prompt(grant_doc, grant_type), model=CLASSIFY_MODEL)
+
+# Turn a grant's eligibility points into numbered yes/no questions for the applicant
+def generate_eligibility_questions(eligibility_points, grant_type):
+    applicant = "the applying company or organization" if grant_type == "COMPANY" else "the individual applicant"
+    prompt = f"""
+    You are a grant eligibility expert. Rewrite each eligibility requirement below as one clear
+    yes/no question addressed to {applicant}, so that answering "yes" to every question means
+    they meet the requirements. Do not add requirements that are not listed.
+
+    Eligibility requirements:
+    {eligibility_points}
+
+    Respond with only the questions, numbered "1.", "2.", and so on, one per line.
+    """
+    return ollama_generate(prompt, model=CLASSIFY_MODEL)
 
 @app.route('/api/eligibility', methods=['POST'])
 def get_eligibility_requirements():
     data = request.json
     grant_content = data.get('grant_content', '')
 
+    # Serve precomputed eligibility when the client identifies the grant
+    precomputed = lookup_insights(data.get('program_id'))
+    if precomputed:
+        if data.get('stream'):
+            return sse_response(stream_precomputed_eligibility(precomputed))
+        return jsonify({
+            'eligibility_points': precomputed['eligibility_points'],
+            'grant_type': precomputed['grant_type'],
+            'precomputed': True
+        })
+
     if not grant_content:
         return jsonify({'error': 'No grant content provided'}), 400
 
     try:
-        # Determine if the grant is for companies or individuals
-        grant_type = determine_grant_type(grant_content)
+        # Stream eligibility points as Server-Sent Events if requested
+        if data.get('stream'):
+            # Determine if the grant is for companies or individuals
+            grant_type = determine_grant_type(grant_content)
 
-        # Create a temporary document
-        doc = Document(page_content=grant_content)
+            # Create a temporary document
+            doc = Document(page_content=grant_content)
 
-        # Extract eligibility points based on the grant type
-        eligibility_points = extract_eligibility_points(doc, grant_type)
+            prompt = build_eligibility_prompt(doc, grant_type)
+            return sse_response(stream_eligibility(prompt, grant_type))
+
+        # Determine the grant type and extract eligibility points based on it
+        grant_type, eligibility_points = analyze_eligibility(grant_content)
 
         return jsonify({
             'eligibility_points': eligibility_points,
@@ -281,13 +614,20 @@ def get_eligibility_requirements():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Generate a grant proposal based on user inputs
-def generate_grant_proposal(grant_content, user_inputs, grant_type):
-    """
-    Generate a grant proposal tailored to either companies or individuals
-    based on the grant type, using placeholders for sensitive information.
-    """
-    # Format user inputs into a readable structure with placeholders
+# Stream eligibility points, announcing the grant type before the first token
+def stream_eligibility(prompt, grant_type):
+    yield sse_event({'grant_type': grant_type}, event='grant_type')
+    yield from stream_generation(prompt, {'grant_type': grant_type}, CLASSIFY_MODEL)
+
+# Replay precomputed eligibility points using the same event sequence as a live stream
+def stream_precomputed_eligibility(precomputed):
+    grant_type = precomputed['grant_type']
+    yield sse_event({'grant_type': grant_type}, event='grant_type')
+    yield sse_event({'content': precomputed['eligibility_points']}, event='token')
+    yield sse_event({'grant_type': grant_type, 'stats': {'precomputed': True}}, event='done')
+
+# Format user inputs into a readable structure with placeholders
+def format_user_inputs(user_inputs):
     formatted_inputs = ""
     for key, value in user_inputs.items():
         # Convert camelCase to readable form
@@ -304,6 +644,11 @@ def generate_grant_proposal(grant_content, user_inputs, grant_type):
             formatted_inputs += f"{readable_key}: [YOUR {readable_key.upper()} HERE]\n"
         else:
             formatted_inputs += f"{readable_key}: {value}\n"
+    return formatted_inputs
+
+# Build the proposal prompt for a grant and the applicant's inputs
+def build_proposal_prompt(grant_content, user_inputs, grant_type):
+    formatted_inputs = format_user_inputs(user_inputs)
 
     if grant_type == "COMPANY":
         prompt = f"""
@@ -374,26 +719,171 @@ def generate_grant_proposal(grant_content, user_inputs, grant_type):
         Create a complete and professional individual-focused grant proposal with appropriate placeholders for sensitive information:
         """
     
+    return prompt
+
+# Generate a grant proposal based on user inputs
+def generate_grant_proposal(grant_content, user_inputs, grant_type):
+    """
+    Generate a grant proposal tailored to either companies or individuals
+    based on the grant type, using placeholders for sensitive information.
+    """
+    return ollama_generate(build_proposal_prompt(grant_content, user_inputs, grant_type), model=PROPOSAL_MODEL)
+
+# Prompts for the given (default: all) sections of a proposal, sharing one compact grant and applicant context
+def proposal_section_prompts(fields, indexes=None, instructions=None):
+    grant_type = fields['grant_type']
+    grant_context = compact_rendered_grant(fields['grant_content'])
+    applicant_context = format_user_inputs(fields['user_inputs']).strip()
+    sections = proposal_sections(grant_type)
+    return [
+        (i, sections[i][0], sections[i][1],
+         build_section_prompt(grant_type, i, grant_context, applicant_context, instructions))
+        for i in (range(len(sections)) if indexes is None else indexes)
+    ]
+
+# Generate one section's text, raising so a failed call is reported on its section
+def generate_section_text(prompt, refresh=False):
+    text = ollama_generate(prompt, refresh=refresh, model=PROPOSAL_MODEL)
+    if text == GENERATION_ERROR:
+        raise RuntimeError(GENERATION_ERROR)
+    return text
+
+# Generate every section of a proposal concurrently, yielding each as it finishes
+def iter_proposal_sections(fields):
+    return generate_sections(proposal_section_prompts(fields), generate_section_text, section_executor)
+
+# Timing of a section-parallel proposal: wall time against the slowest and the summed sections
+def section_stats(sections, started):
+    return {
+        'total_time_ms': round((time.perf_counter() - started) * 1000, 1),
+        'slowest_section_ms': max((section['time_ms'] for section in sections), default=0),
+        'sum_section_ms': round(sum(section['time_ms'] for section in sections), 1),
+        'failed_sections': [section['key'] for section in sections if 'error' in section]
+    }
+
+# Generate a proposal section by section and assemble it in order
+def generate_sectioned_proposal(fields):
+    started = time.perf_counter()
+    sections = sorted(iter_proposal_sections(fields), key=lambda section: section['index'])
+    return {
+        'proposal': assemble_proposal(sections),
+        'sections': sections,
+        'grant_type': fields['grant_type'],
+        'stats': section_stats(sections, started)
+    }
+
+# Stream each section as SSE when it finishes, then the assembled proposal
+def stream_sectioned_proposal(fields):
+    started = time.perf_counter()
+    sections = []
+    for section in iter_proposal_sections(fields):
+        sections.append(section)
+        yield sse_event(section, event='section')
+    yield sse_event({
+        'proposal': assemble_proposal(sections),
+        'grant_type': fields['grant_type'],
+        'stats': section_stats(sections, started)
+    }, event='done')
+
+# Answer a free-form eligibility question from the text of the most relevant grants
+def answer_eligibility_question(context, question):
+    prompt = f"""
+    You are a grant eligibility assistant. Using only the grant information below, answer the
+    applicant's question. Name the grants your answer is based on, and say so plainly if the
+    information does not answer the question.
+
+    Grant Information:
+    ------------------
+    {context}
+    ------------------
+
+    Question: {question}
+    """
     return ollama_generate(prompt)
 
-# Initialize the database at startup
+# Job handler: stream a proposal into the job's output as it is generated
+def run_proposal_job(job):
+    payload = job.payload
+    prompt = build_proposal_prompt(payload['grant_content'], payload['user_inputs'], payload['grant_type'])
+    for content in ollama_generate_stream(prompt, job.stats, PROPOSAL_MODEL):
+        job.emit(content)
+    return {'proposal': job.output, 'grant_type': payload['grant_type']}
+
+job_queue.register('proposal', run_proposal_job)
+
+# Job handler: generate sections concurrently, appending each to the output as it finishes
+def run_sectioned_proposal_job(job):
+    started = time.perf_counter()
+    sections = []
+    for section in iter_proposal_sections(job.payload):
+        sections.append(section)
+        job.emit(section['content'] + "\n\n")
+    job.stats.update(section_stats(sections, started))
+    sections.sort(key=lambda section: section['index'])
+    return {'proposal': assemble_proposal(sections), 'sections': sections, 'grant_type': job.payload['grant_type']}
+
+job_queue.register('proposal_sections', run_sectioned_proposal_job)
+
+# Derive grant type and eligibility points for one grant, for the offline precompute stage
+def analyze_grant(grant):
+    doc = process_grants([grant])[0]
+    grant_type, eligibility_points = analyze_eligibility(doc.page_content)
+
+    # Leave failed grants out so a later run retries them
+    if eligibility_points == GENERATION_ERROR:
+        return None
+
+    return {
+        'grant_type': grant_type,
+        'eligibility_points': eligibility_points
+    }
+
+# Compare the rule-based grant type classifier with the LLM over the whole corpus
+def grant_type_agreement(grants, workers=4):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Label every grant with the LLM alone; repeated runs are served from the LLM cache
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        labels = pool.map(lambda grant: llm_grant_type(process_grants([grant])[0].page_content), grants)
+        llm_types = {str(grant.get('program_id')): label for grant, label in zip(grants, labels)}
+
+    return agreement_report(grants, llm_types)
+
+# Look up precomputed insights for a grant, if any
+def lookup_insights(program_id):
+    if program_id in (None, ''):
+        return None
+    return grant_insights.get(str(program_id))
+
+# Load grants from the compiled snapshot, recompiling it from the JSON feed when stale
+def load_grant_records():
+    snapshot = load_snapshot(grants_file)
+    if snapshot is None:
+        try:
+            build_snapshot(grants_file)
+        except OSError as e:
+            print(f"Could not write the grants snapshot ({e}); reading {grants_file} directly")
+            return load_grants(grants_file)
+        snapshot = load_snapshot(grants_file)
+    return snapshot
+
+# Eligibility matching reads the snapshot's typed columns directly when there is one
+def load_eligibility_index():
+    records = warmup.get('grants')
+    if isinstance(records, GrantSnapshot):
+        return EligibilityIndex.from_snapshot(records)
+    return EligibilityIndex(records)
+
+# Initialize the database, loading the saved index or building it from the grants
 def initialize_db():
-    # Load the grants data
-    print("Loading grants data...")
-    grants = load_grants(grants_file)
-    
-    # Initialize embeddings
-    print("Initializing embeddings...")
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    
     # Try to load existing index first
     db = load_faiss_index(embeddings)
     
     # If no index exists, create one
     if db is None:
-        # Process grants into documents
+        # Fine for small corpora; large ones should be built offline with build_index.py
         print("Processing grants into documents...")
-        documents = process_grants(grants)
+        documents = process_grants(warmup.get('grants'))
         
         # Split documents into chunks
         print("Splitting documents...")
@@ -403,47 +893,314 @@ def initialize_db():
         print("Creating vector database...")
         db = create_vector_db(docs)
         
-        # Save the index for future use
+        # Save the index for future use, with the manifest incremental syncs start from
         save_faiss_index(db)
-    
-    return db, embeddings
+        save_manifest(INDEX_PATH, build_manifest(db, documents, pipeline=pipeline_settings()))
+
+    # Cached results and answers describe the index they were computed from
+    manifest = load_manifest(INDEX_PATH)
+    query_cache.set_index_version(manifest['version'] if manifest else None)
+    return db
+
+# Bring the saved index in line with the grants file, embedding only new or changed grants
+def sync_vector_db(index_path=INDEX_PATH):
+    documents = process_grants(load_grant_records())
+    db = load_faiss_index(embeddings, index_path, writable=True)
+    if db is None:
+        print("No index to sync; building one from scratch")
+        initialize_db()
+        return None
+
+    manifest = load_manifest(index_path)
+    if manifest is None:
+        print("No manifest found; grants already in the index will be re-embedded once")
+        manifest = build_manifest(db, version=0, pipeline=pipeline_settings())
+    manifest.setdefault("pipeline", LEGACY_PIPELINE)
+
+    try:
+        manifest, summary, touched = sync_index(db, documents, manifest, split_grant_documents,
+                                               pipeline_settings())
+        if touched:
+            save_faiss_index(db, index_path)
+            # Derived indexes describe the old chunks; rebuild BM25 and drop stale insights
+            BM25Index.from_faiss(db).save(index_path)
+            drop_insights(insights_path(index_path), touched)
+            save_manifest(index_path, manifest)
+    finally:
+        working_path = os.path.join(index_path, DOCSTORE_FILE + ".sync")
+        if os.path.exists(working_path):
+            os.remove(working_path)
+
+    print(f"Index sync complete: {json.dumps(summary)}")
+    return summary
+
+# Load the BM25 index stored next to the FAISS index, rebuilding it if missing or stale
+def load_bm25_index():
+    bm25 = BM25Index.load(INDEX_PATH)
+    if bm25 is None or bm25.size != db.index.ntotal:
+        print("Building BM25 index...")
+        bm25 = BM25Index.from_faiss(db)
+        bm25.save(INDEX_PATH)
+    return bm25
+
+# Embeddings that defer loading the sentence-transformers model (and torch) until first use
+class LazyEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return embedding_model.embed_documents(texts)
+
+    def embed_query(self, text):
+        return embedding_model.embed_query(text)
+
+embeddings = LazyEmbeddings()
+
+# Embed queries through the query embedding cache, encoding all misses in one batch
+def embed_queries(queries):
+    keys = [normalize_query(query) for query in queries]
+    vectors = [query_cache.embeddings.get(key) for key in keys]
+    missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+    if missing:
+        encoded = dict(zip(missing, np.asarray(embeddings.embed_documents(missing), dtype=np.float32)))
+        for key, vector in encoded.items():
+            query_cache.embeddings.put(key, vector)
+        vectors = [encoded[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+    return vectors
+
+# Components, in warm-up order. Each name is a proxy that loads on first use.
+grants = warmup.register('grants', load_grant_records)
+db = warmup.register('faiss_index', initialize_db)
+grant_insights = warmup.register('grant_insights', lambda: load_insights(insights_path(INDEX_PATH)))
+metadata_index = warmup.register('metadata_index', lambda: MetadataIndex(db))
+chunk_map = warmup.register('chunk_map', lambda: ChunkMap(db))
+bm25_index = warmup.register('bm25_index', load_bm25_index)
+eligibility_index = warmup.register('eligibility_index', load_eligibility_index)
+embedding_model = warmup.register('embedding_model', lambda: HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"))
+
+# Everything derived from the grants file and saved index, reloaded after a sync
+INDEX_COMPONENTS = ['grants', 'faiss_index', 'grant_insights', 'metadata_index', 'chunk_map', 'bm25_index',
+                    'eligibility_index']
+
+# Candidates each retriever contributes before reciprocal rank fusion
+HYBRID_CANDIDATES = 50
+
+# Most results one search may ask for
+SEARCH_K_LIMIT = int(os.environ.get("SEARCH_K_LIMIT", 100))
+
+# Queries accepted by /api/search/batch in one request
+SEARCH_BATCH_LIMIT = int(os.environ.get("SEARCH_BATCH_LIMIT", 256))
+
+# Dense (positions, scores) for a query, answered from a batched first pass when it fetched enough
+def dense_positions(query_vector, k, bitmap=None, prefetched=None):
+    if prefetched is not None:
+        fetched_k, positions, scores = prefetched
+        if k <= fetched_k or len(positions) < fetched_k:
+            return positions[:k], scores[:k]
+    return search_positions(db, query_vector, k, bitmap)
+
+# Search chunks by query vector, optionally restricted to a metadata filter bitmap
+def search_chunks(query_vector, k, bitmap=None, prefetched=None):
+    if bitmap is None and prefetched is None:
+        return db.similarity_search_with_score_by_vector(query_vector, k=k)
+    positions, scores = dense_positions(query_vector, k, bitmap, prefetched)
+    return list(zip(documents_at(db, positions), scores))
+
+# Search chunks with both dense and BM25 retrieval, fused by reciprocal rank
+def hybrid_search_chunks(query, query_vector, k, bitmap=None, prefetched=None):
+    candidates = max(k, HYBRID_CANDIDATES)
+    dense, _ = dense_positions(query_vector, candidates, bitmap, prefetched)
+    sparse_positions = [position for position, _ in bm25_index.search(query, candidates, bitmap)]
+
+    fused = reciprocal_rank_fusion([dense, sparse_positions])[:k]
+    positions = [position for position, _ in fused]
+    return list(zip(documents_at(db, positions), [score for _, score in fused]))
+
+# Format a search hit for the API response
+def format_search_result(doc, score, full_content):
+    result = {
+        'program_id': doc.metadata.get('program_id'),
+        'program_name': doc.metadata.get('program_name', 'N/A'),
+        'program_status': doc.metadata.get('program_status', 'N/A'),
+        'location': doc.metadata.get('location', 'N/A'),
+        'country': doc.metadata.get('country', 'N/A'),
+        'main_industry': doc.metadata.get('main_industry', 'N/A'),
+        'target_audience': doc.metadata.get('target_audience', 'N/A'),
+        'content_preview': doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content,
+        'relevance_score': float(score),
+        'full_content': full_content
+    }
+
+    # Attach precomputed eligibility so the client can skip /api/eligibility
+    precomputed = lookup_insights(doc.metadata.get('program_id'))
+    if precomputed:
+        result['grant_type'] = precomputed['grant_type']
+        result['eligibility_points'] = precomputed['eligibility_points']
+
+    return result
+
+
+# Validate a search request, resolving its filters; raises ValueError with a message for the client
+def parse_search_request(data):
+    query = data.get('query', '')
+    if not query:
+        raise ValueError('No query provided')
+
+    try:
+        k = int(data.get('k', 3))
+    except (TypeError, ValueError):
+        raise ValueError('k must be an integer')
+    if not 1 <= k <= SEARCH_K_LIMIT:
+        raise ValueError(f'k must be between 1 and {SEARCH_K_LIMIT}')
+
+    fusion = data.get('fusion', 'max')
+    if fusion not in ('max', 'sum'):
+        raise ValueError("fusion must be 'max' or 'sum'")
+
+    mode = data.get('mode', 'dense')
+    if mode not in ('dense', 'hybrid'):
+        raise ValueError("mode must be 'dense' or 'hybrid'")
+
+    # Resolve optional metadata filters into a bitmap of matching chunks
+    filters = data.get('filters')
+    return {
+        'query': query,
+        'k': k,
+        'fusion': fusion,
+        'mode': mode,
+        'aggregate': data.get('aggregate', True),
+        'filters': filters,
+        'bitmap': metadata_index.resolve(filters)
+    }
+
+# Results cache key of a parsed search request
+def search_cache_key(search):
+    return (query_cache.index_version, normalize_query(search['query']), search['k'], search['fusion'],
+            search['mode'], bool(search['aggregate']), json.dumps(search['filters'], sort_keys=True, default=str))
+
+# Chunks the first search pass of a request asks for
+def first_fetch(search):
+    fetch_k = initial_fetch(search['k'], db.index.ntotal) if search['aggregate'] else search['k']
+    if search['mode'] == 'hybrid':
+        fetch_k = max(fetch_k, HYBRID_CANDIDATES)
+    return fetch_k
+
+# Run the first dense pass of every search in one multi-query FAISS search per distinct filter
+def prefetch_dense(searches, query_vectors):
+    groups = {}
+    for i, search in enumerate(searches):
+        groups.setdefault(json.dumps(search['filters'], sort_keys=True, default=str), []).append(i)
+
+    prefetched = [None] * len(searches)
+    for members in groups.values():
+        fetch_k = max(first_fetch(searches[i]) for i in members)
+        hits = search_positions_batch(db, [query_vectors[i] for i in members], fetch_k, searches[members[0]]['bitmap'])
+        for i, (positions, scores) in zip(members, hits):
+            prefetched[i] = (fetch_k, positions, scores)
+    return prefetched
+
+# Search for one parsed request, returning the formatted results
+def run_search(search, query_vector, prefetched=None):
+    query, k, bitmap = search['query'], search['k'], search['bitmap']
+
+    # Dense scores are L2 distances; hybrid scores are RRF scores where higher is better
+    if search['mode'] == 'hybrid':
+        chunk_search = lambda n: hybrid_search_chunks(query, query_vector, n, bitmap, prefetched)
+        to_similarity = float
+    else:
+        chunk_search = lambda n: search_chunks(query_vector, n, bitmap, prefetched)
+        to_similarity = distance_to_similarity
+
+    # Raw chunk hits, restricted inside FAISS to the filtered chunks
+    if not search['aggregate']:
+        return [format_search_result(doc, score, doc.page_content) for doc, score in chunk_search(k)]
+
+    # Over-fetch chunks until k distinct grants are found, then fuse scores per grant
+    top_grants = search_distinct_grants(chunk_search, k, db.index.ntotal, search['fusion'], to_similarity)
+
+    # Format results
+    formatted_results = []
+    for grant in top_grants:
+        doc = grant['doc']
+        result = format_search_result(
+            doc, grant['score'], chunk_map.full_text(doc.metadata.get('program_id'))
+        )
+        result['fused_score'] = round(grant['fused_score'], 6)
+        result['matched_chunks'] = grant['matched_chunks']
+        formatted_results.append(result)
+    return formatted_results
 
-# Initialize DB at startup
-db, embeddings = initialize_db()
 
 # API Routes
 @app.route('/api/search', methods=['POST'])
 def search_grants():
-    data = request.json
-    query = data.get('query', '')
-    
-    if not query:
-        return jsonify({'error': 'No query provided'}), 400
-    
     try:
-        # Get relevant documents
-        results_with_scores = db.similarity_search_with_score(query, k=3)
-        
-        # Format results
-        formatted_results = []
-        for i, (doc, score) in enumerate(results_with_scores):
-            formatted_results.append({
-                'program_name': doc.metadata.get('program_name', 'N/A'),
-                'program_status': doc.metadata.get('program_status', 'N/A'),
-                'location': doc.metadata.get('location', 'N/A'),
-                'country': doc.metadata.get('country', 'N/A'),
-                'main_industry': doc.metadata.get('main_industry', 'N/A'),
-                'target_audience': doc.metadata.get('target_audience', 'N/A'),
-                'content_preview': doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content,
-                'relevance_score': float(score),
-                'full_content': doc.page_content
-            })
-        
-        return jsonify({'results': formatted_results})
-    
+        search = parse_search_request(request.json or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        key = search_cache_key(search)
+        results = query_cache.results.get(key)
+        if results is None:
+            results = run_search(search, embed_queries([search['query']])[0])
+            query_cache.results.put(key, results)
+        return jsonify({'results': results})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_grants_batch():
+    data = request.json or {}
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'queries must be a non-empty list'}), 400
+    if len(queries) > SEARCH_BATCH_LIMIT:
+        return jsonify({'error': f'At most {SEARCH_BATCH_LIMIT} queries per batch'}), 400
+
+    # Top-level options (k, filters, mode, ...) apply to every query that does not set its own
+    defaults = {key: value for key, value in data.items() if key != 'queries'}
+    searches = []
+    for i, item in enumerate(queries):
+        if isinstance(item, str):
+            item = {'query': item}
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('expected a query string or object')
+            searches.append(parse_search_request({**defaults, **item}))
+        except ValueError as e:
+            return jsonify({'error': f'queries[{i}]: {e}'}), 400
+
+    try:
+        started = time.perf_counter()
+        keys = [search_cache_key(search) for search in searches]
+        results = [query_cache.results.get(key) for key in keys]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+
+        # One forward pass for every uncached query, then one FAISS search per distinct filter
+        if pending:
+            pending_searches = [searches[i] for i in pending]
+            query_vectors = embed_queries([search['query'] for search in pending_searches])
+            prefetched = prefetch_dense(pending_searches, query_vectors)
+            for i, search, query_vector, fetched in zip(pending, pending_searches, query_vectors, prefetched):
+                results[i] = run_search(search, query_vector, fetched)
+                query_cache.results.put(keys[i], results[i])
+
+        return jsonify({
+            'results': [
+                {'query': search['query'], 'results': search_results}
+                for search, search_results in zip(searches, results)
+            ],
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+        })
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/filters', methods=['GET'])
+def get_search_filters():
+    return jsonify({
+        name: metadata_index.terms(field) for name, field in FILTER_FIELDS.items()
+    })
+
 @app.route('/api/questions', methods=['POST'])
 def get_eligibility_questions():
     data = request.json
@@ -453,15 +1210,19 @@ def get_eligibility_questions():
         return jsonify({'error': 'No grant content provided'}), 400
     
     try:
-        # Determine if the grant is for companies or individuals
-        grant_type = determine_grant_type(grant_content)
-        
-        # Create a temporary document
-        doc = Document(page_content=grant_content)
-        
-        # Generate questions based on the grant type
-        questions = generate_eligibility_questions(doc, grant_type)
-        
+        # Start from the grant's eligibility points, precomputed when the client identifies the grant
+        precomputed = lookup_insights(data.get('program_id'))
+        if precomputed:
+            grant_type, eligibility_points = precomputed['grant_type'], precomputed['eligibility_points']
+        else:
+            grant_type, eligibility_points = analyze_eligibility(grant_content)
+
+        questions = GENERATION_ERROR
+        if eligibility_points != GENERATION_ERROR:
+            questions = generate_eligibility_questions(eligibility_points, grant_type)
+        if questions == GENERATION_ERROR:
+            return jsonify({'error': GENERATION_ERROR}), 500
+
         return jsonify({
             'questions': questions,
             'grant_type': grant_type
@@ -479,13 +1240,24 @@ def get_eligibility_answer():
         return jsonify({'error': 'No question provided'}), 400
     
     try:
-        # Get relevant documents for the question
-        relevant_docs = db.similarity_search(question, k=3)
-        context = "\n\n".join([doc.page_content for doc in relevant_docs])
+        # A near-identical question answered against the same index gets the same answer
+        query_vector = embed_queries([question])[0]
+        cached = query_cache.answers.lookup(query_vector)
+        if cached is not None:
+            matched_question, response, similarity = cached
+            return jsonify(dict(response, cached={'question': matched_question, 'similarity': round(similarity, 4)}))
+
+        # Get the three most relevant distinct grants for the question
+        top_grants = search_distinct_grants(
+            lambda n: search_chunks(query_vector, n), 3, db.index.ntotal
+        )
+        relevant_docs = [grant['doc'] for grant in top_grants]
+        context = "\n\n".join(
+            [chunk_map.full_text(doc.metadata.get('program_id')) for doc in relevant_docs]
+        )
         
         # Get answer
-        answer = answer_eligibility_
-        question(context, question)
+        answer = answer_eligibility_question(context, question)
         
         # Get metadata for relevant grants
         grants_data = []
@@ -497,28 +1269,59 @@ def get_eligibility_answer():
                 'country': doc.metadata.get('country', 'N/A')
             })
         
-        return jsonify({
+        response = {
             'answer': answer,
             'relevant_grants': grants_data
-        })
+        }
+        # Only successful generations are cached; a failed one is retried by the next similar question
+        if answer != GENERATION_ERROR:
+            query_cache.answers.add(normalize_query(question), query_vector, response)
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Validate a proposal request; raises ValueError with a message for the client
+def parse_proposal_request(data):
+    proposal = {
+        'grant_content': data.get('grant_content', ''),
+        'user_inputs': data.get('user_inputs', {}),
+        'grant_type': data.get('grant_type', 'COMPANY')  # Default to company if not specified
+    }
+    if not proposal['grant_content']:
+        raise ValueError('No grant content provided')
+    if not proposal['user_inputs']:
+        raise ValueError('No user inputs provided')
+    if data.get('mode', 'single') not in ('single', 'sections'):
+        raise ValueError("mode must be 'single' or 'sections'")
+    return proposal
+
 @app.route('/api/generate_proposal', methods=['POST'])
 def get_proposal():
     data = request.json
-    grant_content = data.get('grant_content', '')
-    user_inputs = data.get('user_inputs', {})
-    grant_type = data.get('grant_type', 'COMPANY')  # Default to company if not specified
-    
-    if not grant_content:
-        return jsonify({'error': 'No grant content provided'}), 400
-    
-    if not user_inputs:
-        return jsonify({'error': 'No user inputs provided'}), 400
+    try:
+        fields = parse_proposal_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    grant_content, user_inputs, grant_type = fields['grant_content'], fields['user_inputs'], fields['grant_type']
+    # "sections" generates each section as its own concurrent LLM call
+    sectioned = data.get('mode') == 'sections'
     
     try:
+        # Queue the proposal and return at once if requested; see /api/jobs
+        if data.get('async'):
+            return submit_job('proposal_sections' if sectioned else 'proposal', fields, data.get('priority', 0))
+
+        # Stream the proposal as Server-Sent Events if requested
+        if data.get('stream'):
+            if sectioned:
+                return sse_response(stream_sectioned_proposal(fields))
+            prompt = build_proposal_prompt(grant_content, user_inputs, grant_type)
+            return sse_response(stream_generation(prompt, {'grant_type': grant_type}, PROPOSAL_MODEL))
+
+        if sectioned:
+            return jsonify(generate_sectioned_proposal(fields))
+
         # Generate the proposal based on the grant type
         proposal = generate_grant_proposal(grant_content, user_inputs, grant_type)
         
@@ -527,6 +1330,195 @@ def get_proposal():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/generate_proposal/section', methods=['POST'])
+def regenerate_proposal_section():
+    data = request.json or {}
+    try:
+        fields = parse_proposal_request(data)
+        index = find_section(fields['grant_type'], data.get('section'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # A fresh generation rather than the cached one; optional instructions steer the rewrite
+        prompts = proposal_section_prompts(fields, [index], data.get('instructions'))
+        [section] = generate_sections(prompts, lambda prompt: generate_section_text(prompt, refresh=True),
+                                      section_executor)
+        response = {'section': section}
+
+        # Splice into the sections of an earlier response to get the reassembled proposal
+        if data.get('sections'):
+            by_key = {item.get('key'): item for item in data['sections'] if isinstance(item, dict)}
+            by_key[section['key']] = section
+            sections = [
+                dict(by_key[key], index=i)
+                for i, (key, _, _) in enumerate(proposal_sections(fields['grant_type'])) if key in by_key
+            ]
+            response['proposal'] = assemble_proposal(sections)
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Queue a job and describe it to the client, or refuse when the queue is full
+def submit_job(kind, payload, priority=0):
+    try:
+        priority = int(priority)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'priority must be an integer'}), 400
+
+    job_queue.start()
+    try:
+        job_id = job_queue.submit(kind, payload, priority)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '30'}
+
+    job = job_queue.store.get(job_id)
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'position': job_queue.store.position(job_id),
+        'poll': f'/api/jobs/{job_id}',
+        'stream': f'/api/jobs/{job_id}/stream'
+    }), 202
+
+@app.route('/api/jobs/proposal', methods=['POST'])
+def submit_proposal_job():
+    data = request.json or {}
+    try:
+        fields = parse_proposal_request(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    kind = 'proposal_sections' if data.get('mode') == 'sections' else 'proposal'
+    return submit_job(kind, fields, data.get('priority', 0))
+
+# Read a non-negative integer query parameter; raises ValueError with a message for the client
+def int_arg(name, default):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+    if value < 0:
+        raise ValueError(f'{name} must not be negative')
+    return value
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    try:
+        limit = min(int_arg('limit', 50), 500)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'jobs': job_queue.store.list(request.args.get('status'), limit),
+        'queue': job_queue.stats()
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    job['position'] = job_queue.store.position(job_id)
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    status = job_queue.cancel(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    # A running job stops at its next output flush
+    return jsonify({'job_id': job_id, 'status': status, 'cancel_requested': status not in FINISHED})
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def stream_job(job_id):
+    if job_queue.store.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    # Clients reconnecting after a dropped stream pass the length of output they already have
+    try:
+        offset = int_arg('offset', 0)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return sse_response(job_events(job_id, offset))
+
+# Follow a job as SSE: status changes, output as it is flushed, then the finished record
+def job_events(job_id, offset=0):
+    status = None
+    while True:
+        job = job_queue.store.get(job_id)
+        if job['status'] != status:
+            status = job['status']
+            yield sse_event({'status': status, 'position': job_queue.store.position(job_id)}, event='status')
+
+        output = job.pop('output')
+        if len(output) > offset:
+            yield sse_event({'content': output[offset:]}, event='token')
+            offset = len(output)
+
+        if status in FINISHED:
+            yield sse_event(job, event='done')
+            return
+        job_queue.wait(JOB_POLL_SECONDS)
+
+@app.route('/api/match', methods=['POST'])
+def match_grants():
+    data = request.json
+    profile = data.get('profile', {})
+
+    if not isinstance(profile, dict):
+        return jsonify({'error': 'Profile must be an object'}), 400
+
+    try:
+        limit = int(data.get('limit', 50))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+
+    try:
+        return jsonify(eligibility_index.match(profile, limit=limit))
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Liveness: the process is up and serving, whatever the warm-up state
+    return jsonify(dict(warmup.status(), status='ok'))
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    # Readiness: every component is loaded
+    status = warmup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/api/reload_index', methods=['POST'])
+def reload_index():
+    # Pick up an index updated by 'python App.py --sync-index' without restarting
+    warmup.reset(*INDEX_COMPONENTS)
+    manifest = load_manifest(INDEX_PATH)
+    query_cache.set_index_version(manifest['version'] if manifest else None, force=True)
+    if STARTUP_MODE != "lazy":
+        warmup.start(background=True)
+    return jsonify({'reloading': INDEX_COMPONENTS, 'index_version': manifest['version'] if manifest else None})
+
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    if llm_cache is None:
+        return jsonify({'enabled': False, 'query_cache': query_cache.stats(), 'single_flight': single_flight.stats()})
+    return jsonify(dict(llm_cache.stats(), enabled=True, query_cache=query_cache.stats(),
+                        single_flight=single_flight.stats()))
+
+@app.route('/api/llm_backends', methods=['GET'])
+def get_llm_backends():
+    return jsonify(dict(ollama_client.stats(), classify_model=CLASSIFY_MODEL, proposal_model=PROPOSAL_MODEL))
+
 # Serve React static files
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -536,5 +1528,52 @@ def serve(path):
     else:
         return send_from_directory(app.static_folder, 'index.html')
 
+# Background work of a serving process only; the command-line tools below must not race it on the index files
+def start_serving():
+    if STARTUP_MODE != "lazy":
+        warmup.start(background=STARTUP_MODE == "background")
+
+    # Eject unreachable Ollama backends, re-admit recovered ones and learn which models each serves
+    ollama_client.start_health_checks()
+
+    # Pick up jobs queued before a restart
+    job_queue.start()
+
+# Served by a WSGI server
+if __name__ != "__main__":
+    start_serving()
+
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Grant Eligibility RAG System")
+    parser.add_argument("--precompute-insights", action="store_true",
+                        help="Precompute grant type and eligibility points for every grant, then exit")
+    parser.add_argument("--classifier-report", action="store_true",
+                        help="Report agreement between the rule-based grant type classifier and the LLM, then exit")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Parallel Ollama requests during precomputation")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Recompute all grants instead of resuming from the last checkpoint")
+    parser.add_argument("--sync-index", action="store_true",
+                        help="Update the saved index for new, changed and removed grants, then exit")
+    args = parser.parse_args()
+
+    if args.precompute_insights:
+        precompute_insights(
+            load_grant_records(),
+            analyze_grant,
+            insights_path(INDEX_PATH),
+            workers=args.workers,
+            refresh=args.refresh
+        )
+    elif args.sync_index:
+        sync_vector_db()
+    elif args.classifier_report:
+        report = grant_type_agreement(load_grant_records(), workers=args.workers)
+        print(json.dumps(report, indent=2))
+    else:
+        # The reloader's parent process only watches files; the child it spawns serves
+        if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+            start_serving()
+        app.run(debug=True, port=5000)
\ No newline at end of file
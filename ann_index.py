@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Configurable FAISS index factory: Flat, HNSW, IVF-Flat and IVF-PQ
+"""
+
+import math
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+# FAISS warns below roughly this many training points per IVF list
+MIN_POINTS_PER_LIST = 39
+
+
+def default_nlist(n_vectors):
+    """About 4 * sqrt(n) lists, capped so every list gets enough training points."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // MIN_POINTS_PER_LIST))
+
+
+def default_pq_m(dim):
+    """Largest sub-quantizer count up to dim / 8 that divides the dimension."""
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def create_faiss_index(dim, index_type="flat", n_vectors=None, nlist=None, pq_m=None, pq_bits=8,
+                       hnsw_m=32, ef_construction=200):
+    """
+    Create an empty FAISS L2 index of the requested type.
+
+    ``n_vectors`` is the number of training vectors: it sets the default
+    IVF list count and caps the PQ codebook size. IVF indexes still need
+    ``index.train`` before vectors are added.
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Choose one of: {', '.join(INDEX_TYPES)}")
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    nlist = nlist or default_nlist(n_vectors)
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist)
+    # Each sub-quantizer trains 2 ** pq_bits centroids; shrink it for small corpora
+    pq_bits = max(1, min(pq_bits, int(math.log2(max(2, n_vectors // MIN_POINTS_PER_LIST)))))
+    return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m or default_pq_m(dim), pq_bits)
+
+
+def training_sample(vectors, train_size=100000):
+    """A random sample of up to ``train_size`` vectors for IVF training."""
+    if len(vectors) <= train_size:
+        return vectors
+    rng = np.random.default_rng(0)
+    return vectors[rng.choice(len(vectors), train_size, replace=False)]
+
+
+def build_faiss_index(vectors, index_type="flat", nlist=None, pq_m=None, pq_bits=8,
+                      hnsw_m=32, ef_construction=200, nprobe=16, ef_search=64,
+                      train_size=100000):
+    """
+    Build and fill a FAISS L2 index of the requested type.
+
+    IVF indexes are trained on a random sample of up to ``train_size``
+    vectors. ``nprobe`` / ``ef_search`` set the default search-time
+    accuracy/latency trade-off stored with the index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n_vectors, dim = vectors.shape
+
+    index = create_faiss_index(dim, index_type, n_vectors, nlist=nlist, pq_m=pq_m, pq_bits=pq_bits,
+                               hnsw_m=hnsw_m, ef_construction=ef_construction)
+    if not index.is_trained:
+        index.train(training_sample(vectors, train_size))
+
+    index.add(vectors)
+    configure_search(index, nprobe=nprobe, ef_search=ef_search)
+    return index
+
+
+def configure_search(index, nprobe=None, ef_search=None):
+    """Apply search-time parameters to whichever index type this is."""
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexIVF) and nprobe:
+        base.nprobe = min(nprobe, base.nlist)
+    if isinstance(base, faiss.IndexHNSW) and ef_search:
+        base.hnsw.efSearch = ef_search
+    return index
+
+
+def describe_index(index):
+    base = faiss.downcast_index(index)
+    info = {"type": type(base).__name__, "ntotal": int(base.ntotal), "dim": int(base.d)}
+    if isinstance(base, faiss.IndexIVF):
+        info.update(nlist=int(base.nlist), nprobe=int(base.nprobe))
+    if isinstance(base, faiss.IndexHNSW):
+        info.update(ef_search=int(base.hnsw.efSearch))
+    return info
+
+
+def index_memory_bytes(index):
+    """Approximate resident size as the serialized index size."""
+    return int(faiss.serialize_index(index).nbytes)
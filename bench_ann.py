@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark FAISS index types: recall@k against exact search, query latency and memory
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+
+from ann_index import build_faiss_index, configure_search, index_memory_bytes
+
+# (index type, search parameter name, values to sweep)
+CONFIGURATIONS = [
+    ("flat", None, [None]),
+    ("hnsw", "ef_search", [16, 64, 256]),
+    ("ivf_flat", "nprobe", [1, 8, 32]),
+    ("ivf_pq", "nprobe", [8, 32, 64]),
+]
+
+
+def clustered_vectors(n_vectors, dim, n_clusters, rng, batch_size=100000):
+    """Gaussian-mixture vectors, closer to real embeddings than uniform noise."""
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = np.empty((n_vectors, dim), dtype=np.float32)
+    for start in range(0, n_vectors, batch_size):
+        end = min(start + batch_size, n_vectors)
+        labels = rng.integers(0, n_clusters, end - start)
+        vectors[start:end] = centers[labels] + 0.3 * rng.standard_normal((end - start, dim)).astype(np.float32)
+    return vectors, centers
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    hits = sum(len(set(found_row) & set(truth_row)) for found_row, truth_row in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def query_latencies(index, queries, k):
+    samples = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        _, positions = index.search(query[None, :], k)
+        samples.append(time.perf_counter() - started)
+        results[i] = positions[0]
+    samples = np.array(samples) * 1000
+    return results, float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="Corpus sizes to benchmark, e.g. 100000 1000000 3000000")
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeddings have 384 dimensions")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=[name for name, _, _ in CONFIGURATIONS])
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads for queries")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    build_threads = faiss.omp_get_max_threads()
+    print(f"{'size':>9} {'index':>9} {'param':>14} {'build_s':>8} {'memory_mb':>10} "
+          f"{'recall@' + str(args.k):>10} {'p50_ms':>8} {'p99_ms':>8}")
+
+    for size in args.sizes:
+        vectors, _ = clustered_vectors(size, args.dim, max(16, size // 1000), rng)
+        queries = vectors[rng.choice(size, args.queries, replace=False)] + \
+            0.1 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+        del exact
+
+        for index_type, param, values in CONFIGURATIONS:
+            if index_type not in args.types:
+                continue
+
+            faiss.omp_set_num_threads(build_threads)
+            started = time.perf_counter()
+            index = build_faiss_index(vectors, index_type)
+            build_seconds = time.perf_counter() - started
+            memory_mb = index_memory_bytes(index) / 2 ** 20
+
+            faiss.omp_set_num_threads(args.threads)
+            for value in values:
+                if param:
+                    configure_search(index, **{param: value})
+                found, p50, p99 = query_latencies(index, queries, args.k)
+                label = f"{param}={value}" if param else "exact"
+                print(f"{size:>9} {index_type:>9} {label:>14} {build_seconds:>8.2f} {memory_mb:>10.1f} "
+                      f"{recall_at_k(found, truth):>10.3f} {p50:>8.3f} {p99:>8.3f}")
+            del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Compare grant rendering and chunking pipelines: chunk count, token counts, truncation and embedding time
+"""
+
+import argparse
+import itertools
+import time
+
+import numpy as np
+
+from grant_documents import (EMBEDDING_TOKENIZER, MAX_EMBEDDING_TOKENS, iter_grants, process_grants,
+                             split_grant_documents)
+
+PIPELINES = (("full", "chars"), ("full", "tokens"), ("compact", "chars"), ("compact", "tokens"))
+
+
+def measure(grants, render, chunker, tokenizer, embeddings):
+    started = time.perf_counter()
+    chunks = split_grant_documents(process_grants(grants, render), chunker)
+    split_seconds = time.perf_counter() - started
+    texts = [chunk.page_content for chunk in chunks]
+
+    # Token counts as the model sees them, [CLS] and [SEP] included
+    tokens = np.array([len(ids) for ids in tokenizer(texts, add_special_tokens=True)["input_ids"]])
+    lost = np.maximum(tokens - MAX_EMBEDDING_TOKENS, 0)
+    row = {
+        "pipeline": f"{render}/{chunker}",
+        "chunks": len(chunks),
+        "avg_chars": float(np.mean([len(text) for text in texts])) if texts else 0.0,
+        "avg_tokens": float(tokens.mean()) if texts else 0.0,
+        "truncated": float((lost > 0).mean()) if texts else 0.0,
+        "tokens_lost": float(lost.sum() / max(tokens.sum(), 1)),
+        "split_s": split_seconds,
+        "embed_s": None,
+    }
+    if embeddings is not None:
+        started = time.perf_counter()
+        embeddings.embed_documents(texts)
+        row["embed_s"] = time.perf_counter() - started
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grants", default="grantss.json")
+    parser.add_argument("--sample", type=int, default=2000, help="Grants to measure (0 for all)")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--skip-embed", action="store_true", help="Only count chunks and tokens")
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    grants = list(itertools.islice(iter_grants(args.grants), args.sample or None))
+    tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_TOKENIZER)
+    embeddings = None
+    if not args.skip_embed:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embeddings = HuggingFaceEmbeddings(model_name=args.model)
+        embeddings.embed_documents(["warm up"])
+
+    print(f"{len(grants)} grants, model limit {MAX_EMBEDDING_TOKENS} tokens")
+    print(f"{'pipeline':<16}{'chunks':>8}{'chars':>8}{'tokens':>8}{'truncated':>11}{'lost':>8}"
+          f"{'split s':>9}{'embed s':>9}")
+    baseline = None
+    for render, chunker in PIPELINES:
+        row = measure(grants, render, chunker, tokenizer, embeddings)
+        baseline = baseline or row
+        embed = f"{row['embed_s']:>9.2f}" if row["embed_s"] is not None else f"{'-':>9}"
+        print(f"{row['pipeline']:<16}{row['chunks']:>8}{row['avg_chars']:>8.0f}{row['avg_tokens']:>8.1f}"
+              f"{row['truncated']:>10.1%}{row['tokens_lost']:>8.1%}{row['split_s']:>9.2f}{embed}")
+        if row is not baseline:
+            change = row["chunks"] / max(baseline["chunks"], 1) - 1
+            print(f"{'':<16}{change:>+8.0%} chunks vs {baseline['pipeline']}")
+
+
+if __name__ == "__main__":
+    main()
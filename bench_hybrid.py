@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the latency overhead of hybrid (BM25 + dense) search over dense-only search
+"""
+
+import argparse
+import time
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+
+from grant_filters import search_positions
+from sparse_index import BM25Index, reciprocal_rank_fusion
+
+
+def synthetic_corpus(n_docs, vocab_size, words_per_doc, rng):
+    # Zipf-distributed word ids give a realistic mix of common and rare terms
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    ids = np.minimum(rng.zipf(1.2, size=(n_docs, words_per_doc)) - 1, vocab_size - 1)
+    return [" ".join(vocab[i] for i in row) for row in ids], vocab
+
+
+def percentiles(samples):
+    samples = np.array(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(samples, 50)), 3),
+            "p99_ms": round(float(np.percentile(samples, 99)), 3)}
+
+
+def timed(fn, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts, vocab = synthetic_corpus(args.docs, 20000, 150, rng)
+    vectors = rng.standard_normal((args.docs, args.dim)).astype(np.float32)
+
+    started = time.perf_counter()
+    bm25 = BM25Index.from_texts(texts)
+    print(f"BM25 build: {time.perf_counter() - started:.2f}s for {args.docs} docs, {len(bm25.vocab)} terms")
+
+    index = faiss.IndexFlatL2(args.dim)
+    index.add(vectors)
+    db = SimpleNamespace(index=index)
+
+    query_texts = [" ".join(rng.choice(vocab[:2000], size=4)) for _ in range(args.queries)]
+    query_vectors = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries = list(zip(query_texts, query_vectors))
+
+    def dense(query):
+        return search_positions(db, query[1], args.k)
+
+    def sparse(query):
+        return bm25.search(query[0], args.k)
+
+    def hybrid(query):
+        dense_positions, _ = search_positions(db, query[1], args.candidates)
+        sparse_positions = [position for position, _ in bm25.search(query[0], args.candidates)]
+        return reciprocal_rank_fusion([dense_positions, sparse_positions])[:args.k]
+
+    results = {"dense": timed(dense, queries), "sparse": timed(sparse, queries), "hybrid": timed(hybrid, queries)}
+    for name, stats in results.items():
+        print(f"{name:>7}: p50 {stats['p50_ms']:.3f} ms  p99 {stats['p99_ms']:.3f} ms")
+    overhead = results["hybrid"]["p50_ms"] - results["dense"]["p50_ms"]
+    print(f"Hybrid p50 overhead over dense: {overhead:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
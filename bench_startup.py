@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark server startup: time until the port answers /healthz and until /readyz reports ready
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SERVER_CODE = "import App; App.app.run(port={port}, debug=False, use_reloader=False)"
+
+
+def poll(url, deadline, want_ok=False):
+    """Poll ``url`` until it answers (with 200 if ``want_ok``); return seconds waited and the body."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if not want_ok:
+                return json.loads(e.read())
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{url} did not become available")
+
+
+def measure(mode, port, timeout):
+    env = dict(os.environ, STARTUP_MODE=mode)
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER_CODE.format(port=port)],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        poll(f"http://127.0.0.1:{port}/healthz", deadline)
+        bound = time.perf_counter() - started
+
+        if mode == "lazy":
+            # Nothing warms up on its own in lazy mode; one search pulls in what it needs
+            request = urllib.request.Request(
+                f"http://127.0.0.1:{port}/api/search",
+                data=json.dumps({"query": "small business grant"}).encode("utf-8"),
+                headers={"Content-Type": "application/json"}
+            )
+            urllib.request.urlopen(request, timeout=timeout).read()
+            first_query = time.perf_counter() - started
+            status = poll(f"http://127.0.0.1:{port}/healthz", deadline)
+            return {"mode": mode, "bind_s": round(bound, 3), "first_search_s": round(first_query, 3),
+                    "components": status["components"]}
+
+        status = poll(f"http://127.0.0.1:{port}/readyz", deadline, want_ok=True)
+        ready = time.perf_counter() - started
+        return {"mode": mode, "bind_s": round(bound, 3), "ready_s": round(ready, 3),
+                "components": status["components"]}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", nargs="+", default=["eager", "background", "lazy"])
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    for mode in args.modes:
+        result = measure(mode, args.port, args.timeout)
+        timings = {name: entry.get("seconds") for name, entry in result.pop("components").items()}
+        print(json.dumps(result), "components:", json.dumps(timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+Offline index build: stream grants through render -> chunk -> embed -> add, with checkpoints to resume from
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import faiss
+import numpy as np
+
+from ann_index import INDEX_TYPES, configure_search, create_faiss_index, describe_index, training_sample
+from grant_documents import iter_grants, pipeline_settings, render_grant, split_grant_documents
+from index_sync import combine_hashes, document_hash, grant_key, save_manifest
+from sparse_index import BM25_FILE
+from sqlite_docstore import DOCSTORE_FILE, SCHEMA
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+BUILD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS build_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS grant_hashes (
+    seq INTEGER PRIMARY KEY,
+    grant_key TEXT NOT NULL,
+    hash TEXT NOT NULL
+);
+"""
+
+# Settings a resumed build must share with the checkpoint it resumes from
+RESUME_SETTINGS = ("grants_file", "index_type", "nlist", "pq_m", "hnsw_m", "model_name", "pipeline")
+
+_model = None
+
+
+def init_embedder(model_name, threads):
+    """Load the embedding model once per worker process."""
+    global _model
+    import torch
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    torch.set_num_threads(threads)
+    _model = HuggingFaceEmbeddings(model_name=model_name)
+
+
+def embed_texts(texts):
+    return np.asarray(_model.embed_documents(texts), dtype=np.float32)
+
+
+def chunk_batches(grants, start, batch_size):
+    """
+    Render and chunk grants from position ``start`` on, yielding
+    (grants_done, chunks, hashes) batches of at least ``batch_size``
+    chunks. A grant's chunks never straddle two batches, so every
+    checkpoint falls on a grant boundary.
+    """
+    chunks, hashes = [], []
+    seq = start
+    for seq, grant in enumerate(grants):
+        if seq < start:
+            continue
+        doc = render_grant(grant)
+        hashes.append((seq, grant_key(doc.metadata), document_hash(doc)))
+        chunks.extend(split_grant_documents([doc]))
+        if len(chunks) >= batch_size:
+            yield seq + 1, chunks, hashes
+            chunks, hashes = [], []
+    if hashes:
+        yield seq + 1, chunks, hashes
+
+
+class IndexBuilder:
+    """
+    Builds an index directory in a staging area next to it.
+
+    Chunks, positions and per-grant hashes go into the staging SQLite
+    docstore as vectors are added, inside a transaction that is only
+    committed at a checkpoint together with the FAISS index file and the
+    number of grants done. A crash therefore rolls back to the last
+    checkpoint, and a rerun picks up from there. Memory is bounded by the
+    batches in flight (plus the IVF training sample), not by the corpus.
+    """
+
+    def __init__(self, index_path, settings, checkpoint_every=20000, nprobe=16, ef_search=64,
+                 train_size=100000):
+        self.index_path = index_path
+        self.staging_path = index_path.rstrip("/\\") + ".build"
+        self.settings = settings
+        self.checkpoint_every = checkpoint_every
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.train_size = train_size
+
+        self.index = None
+        self.grants_done = 0
+        self.checkpointed_grants = 0
+        self.since_checkpoint = 0
+        self.pending = []
+
+    def open(self, restart=False):
+        """Open the staging area, resuming from its last checkpoint unless ``restart``."""
+        if restart and os.path.exists(self.staging_path):
+            shutil.rmtree(self.staging_path)
+        os.makedirs(self.staging_path, exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(self.staging_path, DOCSTORE_FILE))
+        self.conn.executescript(SCHEMA + BUILD_SCHEMA)
+        state = dict(self.conn.execute("SELECT key, value FROM build_state"))
+        if not state:
+            self.save_state(settings=json.dumps(self.settings))
+            self.conn.commit()
+            return
+
+        saved = json.loads(state["settings"])
+        changed = [name for name in RESUME_SETTINGS if saved.get(name) != self.settings.get(name)]
+        if changed:
+            raise SystemExit(f"Checkpoint in {self.staging_path} was built with different {', '.join(changed)}; "
+                             f"rerun with --restart")
+
+        self.grants_done = self.checkpointed_grants = int(state.get("grants_done", 0))
+        index_file = state.get("index_file")
+        if index_file:
+            self.index = faiss.read_index(os.path.join(self.staging_path, index_file))
+        self.remove_stale_checkpoints(index_file)
+        print(f"Resuming after {self.grants_done} grants ({self.index.ntotal if self.index else 0} chunks)")
+
+    def save_state(self, **values):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO build_state (key, value) VALUES (?, ?)",
+            [(key, str(value)) for key, value in values.items()]
+        )
+
+    def remove_stale_checkpoints(self, keep):
+        for name in os.listdir(self.staging_path):
+            if name.startswith("index-") and name.endswith(".faiss") and name != keep:
+                os.remove(os.path.join(self.staging_path, name))
+
+    def add(self, vectors, chunks, hashes, grants_done):
+        """Add one embedded batch, in grant order."""
+        if self.index is None:
+            # IVF needs a training sample before anything can be added, so hold batches until there is one
+            self.pending.append((vectors, chunks, hashes, grants_done))
+            if not self.settings["index_type"].startswith("ivf") or \
+                    sum(len(batch[0]) for batch in self.pending) >= self.train_size:
+                self.create_index()
+            return
+
+        start = self.index.ntotal
+        self.index.add(vectors)
+        doc_ids = [str(uuid.uuid4()) for _ in chunks]
+        self.conn.executemany(
+            "INSERT INTO documents (doc_id, page_content, metadata) VALUES (?, ?, ?)",
+            [(doc_id, chunk.page_content, json.dumps(chunk.metadata, ensure_ascii=False))
+             for doc_id, chunk in zip(doc_ids, chunks)]
+        )
+        self.conn.executemany(
+            "INSERT INTO positions (position, doc_id) VALUES (?, ?)",
+            [(start + offset, doc_id) for offset, doc_id in enumerate(doc_ids)]
+        )
+        self.conn.executemany("INSERT OR REPLACE INTO grant_hashes (seq, grant_key, hash) VALUES (?, ?, ?)", hashes)
+
+        self.grants_done = grants_done
+        self.since_checkpoint += len(chunks)
+        if self.since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def create_index(self):
+        pending, self.pending = self.pending, []
+        vectors = np.concatenate([batch[0] for batch in pending])
+        self.index = create_faiss_index(
+            vectors.shape[1],
+            self.settings["index_type"],
+            len(vectors),
+            nlist=self.settings["nlist"],
+            pq_m=self.settings["pq_m"],
+            hnsw_m=self.settings["hnsw_m"]
+        )
+        if not self.index.is_trained:
+            print(f"Training {self.settings['index_type']} index on {min(len(vectors), self.train_size)} vectors...")
+            self.index.train(training_sample(vectors, self.train_size))
+        del vectors
+        for batch in pending:
+            self.add(*batch)
+
+    def checkpoint(self):
+        if self.index is None:
+            return
+        index_file = f"index-{self.index.ntotal}.faiss"
+        faiss.write_index(self.index, os.path.join(self.staging_path, index_file))
+        self.save_state(grants_done=self.grants_done, index_file=index_file)
+        self.conn.commit()
+        self.remove_stale_checkpoints(index_file)
+        self.checkpointed_grants = self.grants_done
+        self.since_checkpoint = 0
+
+    def finish(self):
+        """Move the finished index, docstore and manifest into the index directory."""
+        if self.index is None and self.pending:
+            self.create_index()
+        if self.index is None:
+            raise SystemExit("No grants to index")
+        self.conn.commit()
+
+        os.makedirs(self.index_path, exist_ok=True)
+        configure_search(self.index, nprobe=self.nprobe, ef_search=self.ef_search)
+        tmp_path = os.path.join(self.index_path, "index.faiss.tmp")
+        faiss.write_index(self.index, tmp_path)
+
+        manifest = self.manifest()
+        self.conn.executescript("DROP TABLE build_state; DROP TABLE grant_hashes;")
+        self.conn.commit()
+        self.conn.close()
+
+        os.replace(tmp_path, os.path.join(self.index_path, "index.faiss"))
+        os.replace(os.path.join(self.staging_path, DOCSTORE_FILE), os.path.join(self.index_path, DOCSTORE_FILE))
+        save_manifest(self.index_path, manifest)
+        # The server rebuilds BM25 from the new chunks on its next start
+        bm25_path = os.path.join(self.index_path, BM25_FILE)
+        if os.path.exists(bm25_path):
+            os.remove(bm25_path)
+        shutil.rmtree(self.staging_path)
+        print(f"Index written to {self.index_path}: {describe_index(self.index)}")
+
+    def manifest(self):
+        """The index_sync manifest, built from the staging tables without loading chunk text."""
+        hashes = {}
+        for key, digest in self.conn.execute("SELECT grant_key, hash FROM grant_hashes ORDER BY seq"):
+            hashes.setdefault(key, []).append(digest)
+        doc_ids = {}
+        rows = self.conn.execute(
+            "SELECT d.doc_id, d.metadata FROM positions p JOIN documents d ON d.doc_id = p.doc_id "
+            "ORDER BY p.position"
+        )
+        for doc_id, metadata in rows:
+            doc_ids.setdefault(grant_key(json.loads(metadata)), []).append(doc_id)
+
+        return {
+            "version": 1,
+            "updated_at": time.time(),
+            "pipeline": self.settings["pipeline"],
+            "grants": {
+                key: {"hash": combine_hashes(digests), "doc_ids": doc_ids.get(key, [])}
+                for key, digests in hashes.items()
+            }
+        }
+
+
+def build(args):
+    settings = {
+        "grants_file": os.path.abspath(args.grants),
+        "index_type": args.index_type,
+        "nlist": args.nlist,
+        "pq_m": args.pq_m,
+        "hnsw_m": args.hnsw_m,
+        "model_name": args.model,
+        "pipeline": pipeline_settings()
+    }
+    builder = IndexBuilder(args.index_path, settings, checkpoint_every=args.checkpoint_every,
+                           nprobe=args.nprobe, ef_search=args.ef_search, train_size=args.train_size)
+    builder.open(restart=args.restart)
+
+    grants = iter_grants(args.grants)
+    threads = args.threads or max(1, (os.cpu_count() or 1) // max(1, args.workers))
+    pool = None
+    if args.workers > 0:
+        pool = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_embedder,
+            initargs=(args.model, threads)
+        )
+    else:
+        init_embedder(args.model, threads)
+
+    started = time.perf_counter()
+    last_report = started
+    chunks_done = 0
+    in_flight = deque()
+
+    def drain(limit):
+        nonlocal chunks_done, last_report
+        while len(in_flight) > limit:
+            future, chunks, hashes, grants_done = in_flight.popleft()
+            builder.add(future.result() if pool else future, chunks, hashes, grants_done)
+            chunks_done += len(chunks)
+
+            now = time.perf_counter()
+            if now - last_report >= args.progress_every:
+                rate = chunks_done / (now - started)
+                print(f"  {builder.grants_done} grants, {chunks_done} chunks embedded "
+                      f"({rate:.1f} chunks/s)")
+                last_report = now
+
+    try:
+        for grants_done, chunks, hashes in chunk_batches(grants, builder.grants_done, args.batch_size):
+            texts = [chunk.page_content for chunk in chunks]
+            result = pool.submit(embed_texts, texts) if pool else embed_texts(texts)
+            in_flight.append((result, chunks, hashes, grants_done))
+            # Keep every worker busy with one batch queued behind it, and no more
+            drain(2 * max(1, args.workers) - 1)
+        drain(0)
+    except KeyboardInterrupt:
+        raise SystemExit(f"Interrupted; rerun to resume after grant {builder.checkpointed_grants}, "
+                         f"the last checkpoint")
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+    builder.finish()
+    elapsed = time.perf_counter() - started
+    print(f"Embedded {chunks_done} chunks from {builder.grants_done} grants in {elapsed:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--grants", default="grantss.json")
+    parser.add_argument("--index-path", default="grants_faiss_index")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=os.environ.get("FAISS_INDEX_TYPE", "flat"))
+    parser.add_argument("--nlist", type=int, default=int(os.environ.get("FAISS_NLIST", 0)) or None)
+    parser.add_argument("--nprobe", type=int, default=int(os.environ.get("FAISS_NPROBE", 16)))
+    parser.add_argument("--hnsw-m", type=int, default=int(os.environ.get("FAISS_HNSW_M", 32)))
+    parser.add_argument("--ef-search", type=int, default=int(os.environ.get("FAISS_EF_SEARCH", 64)))
+    parser.add_argument("--pq-m", type=int, default=int(os.environ.get("FAISS_PQ_M", 0)) or None)
+    parser.add_argument("--train-size", type=int, default=100000,
+                        help="Vectors held back to train IVF indexes before adding")
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunks per embedding batch")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Embedding processes; 0 embeds in this process")
+    parser.add_argument("--threads", type=int, default=0,
+                        help="Torch threads per embedding process (default: CPUs / workers)")
+    parser.add_argument("--checkpoint-every", type=int, default=20000, help="Chunks between checkpoints")
+    parser.add_argument("--progress-every", type=float, default=10, help="Seconds between progress lines")
+    parser.add_argument("--restart", action="store_true", help="Discard any checkpoint and build from scratch")
+    build(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized applicant-profile eligibility matching over the whole grants corpus
+"""
+
+import re
+import time
+from datetime import date
+
+import numpy as np
+
+# Tri-state encoding for boolean grant fields
+UNKNOWN, NO, YES = -1, 0, 1
+
+TRUE_STRINGS = {"true", "yes", "y", "1", "required"}
+FALSE_STRINGS = {"false", "no", "n", "0", "not required"}
+
+# Locations that cover every region of a country
+NATIONWIDE_LOCATIONS = {"", "all", "national", "nationwide", "canada", "any", "n/a"}
+
+
+def to_float(value):
+    if value in (None, "") or isinstance(value, bool):
+        return np.nan
+    try:
+        return float(str(value).replace(",", "").replace("$", "").strip())
+    except ValueError:
+        return np.nan
+
+
+def to_tristate(value):
+    if isinstance(value, bool):
+        return YES if value else NO
+    text = str(value if value is not None else "").strip().lower()
+    if text in TRUE_STRINGS:
+        return YES
+    if text in FALSE_STRINGS:
+        return NO
+    return UNKNOWN
+
+
+def to_date(value):
+    match = re.match(r"(\d{4}-\d{2}-\d{2})", str(value or ""))
+    if match is None:
+        return np.datetime64("NaT", "D")
+    try:
+        return np.datetime64(match.group(1), "D")
+    except ValueError:
+        return np.datetime64("NaT", "D")
+
+
+def intern_strings(values):
+    """Encode strings as int32 codes into a table of distinct values."""
+    table = {}
+    codes = np.fromiter(
+        (table.setdefault(str(value or "").strip(), len(table)) for value in values),
+        dtype=np.int32,
+        count=len(values)
+    )
+    return codes, list(table)
+
+
+class EligibilityIndex:
+    """
+    Columnar view of the grant fields that decide hard eligibility.
+
+    Numeric bounds are float64 arrays with NaN for "no limit", boolean
+    requirements are tri-state int8 arrays and categorical fields are
+    interned into int32 codes. String predicates are evaluated once per
+    distinct value and broadcast through the codes, so a profile is
+    matched against every grant in a single vectorized pass.
+    """
+
+    def __init__(self, grants):
+        self.size = len(grants)
+        self.program_ids = [grant.get('program_id') for grant in grants]
+        self.program_names = [grant.get('program_name', '') for grant in grants]
+
+        self.min_employees = np.array([to_float(g.get('min_employees')) for g in grants], dtype=np.float64)
+        self.max_employees = np.array([to_float(g.get('max_employees')) for g in grants], dtype=np.float64)
+        self.min_revenue = np.array([to_float(g.get('min_revenue')) for g in grants], dtype=np.float64)
+        self.max_revenue = np.array([to_float(g.get('max_revenue')) for g in grants], dtype=np.float64)
+        self.max_funding = np.array([to_float(g.get('max_funding')) for g in grants], dtype=np.float64)
+
+        self.for_profit = np.array([to_tristate(g.get('for_profit')) for g in grants], dtype=np.int8)
+        self.incorporated = np.array([to_tristate(g.get('incorporated')) for g in grants], dtype=np.int8)
+        self.indigenous_group = np.array([to_tristate(g.get('indigenous_group')) for g in grants], dtype=np.int8)
+
+        self.close_date = np.array([to_date(g.get('close_date')) for g in grants], dtype="datetime64[D]")
+
+        self.location, self.location_table = intern_strings([g.get('location') for g in grants])
+        self.country, self.country_table = intern_strings([g.get('country') for g in grants])
+        self.status, self.status_table = intern_strings([g.get('program_status') for g in grants])
+
+        self.status_closed = np.array(
+            [status.lower() == "closed" for status in self.status_table], dtype=bool
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Wrap the memory-mapped columns of a grant_snapshot.GrantSnapshot without decoding any records."""
+        index = cls.__new__(cls)
+        index.size = len(snapshot)
+        index.program_ids = snapshot.program_ids
+        index.program_names = snapshot.program_names
+
+        for field in ('min_employees', 'max_employees', 'min_revenue', 'max_revenue', 'max_funding'):
+            setattr(index, field, snapshot.floats[field])
+        for field in ('for_profit', 'incorporated', 'indigenous_group'):
+            setattr(index, field, snapshot.tristates[field])
+        index.close_date = snapshot.dates['close_date']
+
+        index.location, index.location_table = snapshot.codes['location'], snapshot.tables['location']
+        index.country, index.country_table = snapshot.codes['country'], snapshot.tables['country']
+        index.status, index.status_table = snapshot.codes['program_status'], snapshot.tables['program_status']
+
+        index.status_closed = np.array(
+            [status.lower() == "closed" for status in index.status_table], dtype=bool
+        )
+        return index
+
+    def match(self, profile, limit=50):
+        """
+        Return grants the applicant can get, most specific matches first.
+
+        ``profile`` keys (all optional): employees, revenue, location,
+        country, for_profit, incorporated, indigenous, include_closed and
+        as_of (YYYY-MM-DD, defaults to today). Flags are read like the
+        grant fields, so "false" and "no" mean no. Location and country
+        match whole words of a grant's value. Grant fields that are empty
+        never exclude a grant. Survivors are ranked by how many of their
+        stated criteria the profile satisfied, then by max funding.
+        Raises ValueError for an as_of that is not a date.
+        """
+        include_closed = to_tristate(profile.get('include_closed')) == YES
+        as_of = None
+        if not include_closed:
+            as_of = to_date(profile.get('as_of') or date.today().isoformat())
+            if np.isnat(as_of):
+                raise ValueError(f"as_of must be a date in YYYY-MM-DD form, got {profile.get('as_of')!r}")
+
+        started = time.perf_counter()
+        eligible = np.ones(self.size, dtype=bool)
+        specificity = np.zeros(self.size, dtype=np.int16)
+
+        employees = to_float(profile.get('employees'))
+        if not np.isnan(employees):
+            eligible &= self._within(self.min_employees, self.max_employees, employees, specificity)
+
+        revenue = to_float(profile.get('revenue'))
+        if not np.isnan(revenue):
+            eligible &= self._within(self.min_revenue, self.max_revenue, revenue, specificity)
+
+        location = str(profile.get('location') or "").strip().lower()
+        if location:
+            eligible &= self._categorical(self.location, self.location_table, location, specificity,
+                                          wildcard=NATIONWIDE_LOCATIONS)
+
+        country = str(profile.get('country') or "").strip().lower()
+        if country:
+            eligible &= self._categorical(self.country, self.country_table, country, specificity)
+
+        for_profit = to_tristate(profile.get('for_profit'))
+        if for_profit != UNKNOWN:
+            required = self.for_profit != UNKNOWN
+            eligible &= ~required | (self.for_profit == for_profit)
+            specificity += required
+
+        # Incorporation and indigenous status only exclude when the grant requires them
+        for key, column in (('incorporated', self.incorporated), ('indigenous', self.indigenous_group)):
+            required = column == YES
+            if to_tristate(profile.get(key)) == YES:
+                specificity += required
+            else:
+                eligible &= ~required
+
+        if not include_closed:
+            eligible &= ~self.status_closed[self.status]
+            eligible &= np.isnat(self.close_date) | (self.close_date >= as_of)
+
+        survivors = np.flatnonzero(eligible)
+        funding = np.nan_to_num(self.max_funding[survivors], nan=0.0)
+        order = survivors[np.lexsort((-funding, -specificity[survivors]))][:limit]
+
+        results = [{
+            'program_id': self.program_ids[i],
+            'program_name': self.program_names[i],
+            'program_status': self.status_table[self.status[i]],
+            'location': self.location_table[self.location[i]],
+            'country': self.country_table[self.country[i]],
+            'close_date': None if np.isnat(self.close_date[i]) else str(self.close_date[i]),
+            'max_funding': None if np.isnan(self.max_funding[i]) else float(self.max_funding[i]),
+            'matched_criteria': int(specificity[i])
+        } for i in order]
+
+        return {
+            'results': results,
+            'eligible_count': int(survivors.size),
+            'grants_evaluated': self.size,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    @staticmethod
+    def _within(lower, upper, value, specificity):
+        has_lower = ~np.isnan(lower)
+        has_upper = ~np.isnan(upper)
+        specificity += has_lower | has_upper
+        with np.errstate(invalid="ignore"):
+            return (~has_lower | (lower <= value)) & (~has_upper | (upper >= value))
+
+    @staticmethod
+    def _categorical(codes, table, wanted, specificity, wildcard=("",)):
+        # Evaluate the predicate once per distinct value, then broadcast through the codes
+        # Whole words only, so "on" does not match "Ontario"; multi-word values like "British Columbia" still match
+        term = re.compile(r"(?<!\w)" + re.escape(wanted) + r"(?!\w)")
+        open_to_all = np.array([value.lower() in wildcard for value in table], dtype=bool)
+        matches = np.array([term.search(value.lower()) is not None for value in table], dtype=bool)
+        specificity += ~open_to_all[codes]
+        return (open_to_all | matches)[codes]
@@ -6,6 +6,7 @@ Fix JSON file with invalid control characters
 import json
 import re
 import os
+import time
 
 def fix_json_file(input_file, output_file=None):
     """
@@ -87,13 +88,274 @@ def fix_json_file(input_file, output_file=None):
         print(f"Error processing file: {e}")
         return False
 
+# Bytes that change the repair state inside and outside JSON strings. UTF-8 continuation
+# bytes are all >= 0x80, so scanning raw bytes never splits a multi-byte character.
+STRING_SPECIAL_RE = re.compile(rb'["\\]')
+STRUCTURE_SPECIAL_RE = re.compile(rb'[\x00-\x20\x7f]+|["{}\[\],]')
+CONTROL_RE = re.compile(rb'[\x00-\x1f\x7f]')
+CONTROL_BYTES = bytes([*range(0x20), 0x7f])
+
+# Control characters inside strings that have a JSON escape letter; the rest are dropped
+STRING_CONTROL_ESCAPES = {ord('\n'): b'n', ord('\r'): b'r', ord('\t'): b't'}
+
+VALID_ESCAPES = frozenset(b'"\\/bfnrtu')
+
+
+def escape_controls(segment):
+    """Escape raw newlines, carriage returns and tabs in a piece of string content; drop other controls."""
+    if CONTROL_RE.search(segment) is None:
+        return segment
+    segment = segment.replace(b'\n', b'\\n').replace(b'\r', b'\\r').replace(b'\t', b'\\t')
+    return segment.translate(None, CONTROL_BYTES)
+
+
+def is_blank(byte):
+    return byte <= 0x20 or byte == 0x7f
+
+
+class StreamRepair:
+    """
+    Byte-level state machine that splits a JSON array (or a stream of
+    concatenated / newline-delimited objects) into top-level records and
+    repairs each one on the way.
+
+    Inside strings, raw newlines, carriage returns and tabs are escaped,
+    other control characters dropped and stray backslashes escaped;
+    outside strings, control characters are dropped. Runs of ordinary
+    bytes are copied in bulk between regex matches, so the per-byte
+    Python work is limited to quotes, brackets and separators. Each
+    finished record is passed to ``emit(record, start, end, raw, error)``
+    with its byte offsets in the input and its original bytes.
+    """
+
+    def __init__(self, emit, max_record_bytes=64 << 20):
+        self.emit = emit
+        self.max_record_bytes = max_record_bytes
+        self.depth = 0
+        self.record_level = None  # 1 inside a top-level array, 0 for a stream of objects
+        self.in_string = False
+        self.escape = False
+        self.record = None
+        self.raw = None
+        self.record_start = 0
+        self.offset = 0  # input offset of the current chunk
+        self.chunk = b''
+        self.raw_from = 0
+
+    def feed(self, chunk):
+        self.chunk = chunk
+        self.raw_from = 0
+        pos, size = 0, len(chunk)
+        while pos < size:
+            if self.record is None:
+                pos = self.between_records(chunk[pos], pos)
+                continue
+
+            if self.in_string:
+                match = STRING_SPECIAL_RE.search(chunk, pos)
+                end = match.start() if match else size
+                if end > pos:
+                    self.string_content(chunk[pos:end])
+            else:
+                match = STRUCTURE_SPECIAL_RE.search(chunk, pos)
+                end = match.start() if match else size
+                self.record += chunk[pos:end]
+            if match is None:
+                break
+            pos = match.end()
+            if self.in_string:
+                self.string_byte(chunk[end], pos)
+            else:
+                self.structure_byte(chunk[end], pos, end)
+
+        if self.record is not None:
+            self.raw += chunk[self.raw_from:]
+            if len(self.record) > self.max_record_bytes:
+                self.raw_from = size
+                self.finish_record(size, error="Record too large or unbalanced")
+                self.depth = self.record_level or 0
+                self.in_string = self.escape = False
+        self.offset += size
+
+    def between_records(self, byte, pos):
+        """Handle a byte outside any record; return the position to continue from."""
+        if byte == ord('[') and self.record_level is None:
+            # Opening bracket of a top-level array: records are its elements
+            self.record_level = self.depth = 1
+        elif byte == ord(']') and self.record_level == 1:
+            self.record_level = None
+            self.depth = 0
+        elif not (byte == ord(',') or is_blank(byte)):
+            if self.record_level is None:
+                self.record_level = self.depth = 0
+            self.record = bytearray()
+            self.raw = bytearray()
+            self.record_start = self.offset + pos
+            self.raw_from = pos
+            return pos
+        return pos + 1
+
+    def structure_byte(self, byte, pos, start):
+        """Handle a special byte (or whitespace run) outside strings spanning ``start:pos``."""
+        at_record_level = self.depth == self.record_level
+        if byte in b'{[':
+            self.depth += 1
+            self.record.append(byte)
+        elif byte in b'}]':
+            if at_record_level:
+                # Closes something this record never opened (e.g. the array after a scalar)
+                if self.record.strip():
+                    self.finish_record(start)
+                if byte == ord(']') and self.record_level == 1:
+                    self.record_level = None
+                    self.depth = 0
+                return
+            self.depth -= 1
+            self.record.append(byte)
+            if self.depth == self.record_level:
+                self.finish_record(pos)
+        elif byte == ord('"'):
+            self.in_string = True
+            self.record.append(byte)
+        elif at_record_level:
+            # Separator or whitespace after a scalar record
+            if self.record:
+                self.finish_record(start)
+        elif byte == ord(','):
+            self.record.append(byte)
+        # Whitespace and control characters between tokens are dropped
+
+    def string_content(self, segment):
+        """Append string content up to the next quote or backslash."""
+        if self.escape:
+            self.escape = False
+            first = segment[0]
+            if first in STRING_CONTROL_ESCAPES:
+                # Backslash followed by a raw newline: keep it as the escape it was meant to be
+                self.record += STRING_CONTROL_ESCAPES[first]
+                segment = segment[1:]
+            elif first not in VALID_ESCAPES:
+                # Stray backslash: make it a literal one
+                self.record += b'\\'
+        self.record += escape_controls(segment)
+
+    def string_byte(self, byte, pos):
+        """Handle a quote or backslash inside a string; ``pos`` is just past it."""
+        if self.escape:
+            self.escape = False
+            self.record.append(byte)
+        elif byte == ord('\\'):
+            self.record.append(byte)
+            self.escape = True
+        else:
+            self.record.append(byte)
+            self.in_string = False
+            if self.depth == self.record_level:
+                self.finish_record(pos)
+
+    def finish_record(self, end, error=None):
+        """Emit the current record, which ends at chunk position ``end``."""
+        raw = self.raw + self.chunk[self.raw_from:end]
+        record, self.record, self.raw = self.record, None, None
+        self.emit(bytes(record), self.record_start, self.offset + end, bytes(raw), error)
+
+    def close(self):
+        if self.record is None:
+            return
+        self.chunk, self.raw_from = b'', 0
+        if self.in_string or self.depth != self.record_level:
+            self.finish_record(0, error="Truncated record at end of input")
+        elif self.record.strip():
+            self.finish_record(0)
+
+
+def repair_json_stream(input_file, output_file=None, quarantine_file=None,
+                       chunk_size=1 << 20, max_record_bytes=64 << 20, progress_every=5.0):
+    """
+    Repair a large JSON array of grants chunk by chunk, writing one record per line (NDJSON).
+
+    Records that still do not parse are written to ``quarantine_file`` as
+    JSON lines with their byte offsets in the input, the parse error and
+    the original text, so the rest of the feed is not held back by them.
+    Memory use is bounded by the chunk size and the largest record.
+
+    Returns:
+        dict: Record counts, bytes read and throughput
+    """
+    if output_file is None:
+        output_file = input_file + '.ndjson'
+    if quarantine_file is None:
+        quarantine_file = output_file + '.quarantine'
+
+    print(f"Streaming repair of {input_file} -> {output_file} (quarantine: {quarantine_file})")
+    stats = {'records': 0, 'quarantined': 0, 'bytes': 0}
+    started = last_report = time.perf_counter()
+
+    with open(input_file, 'rb') as src, \
+            open(output_file, 'w', encoding='utf-8') as out, \
+            open(quarantine_file, 'w', encoding='utf-8') as quarantine:
+
+        def emit(record, start, end, raw, error=None):
+            if error is None:
+                try:
+                    value = json.loads(record.decode('utf-8', errors='replace'))
+                except json.JSONDecodeError as e:
+                    error = f"{e.msg} at record byte {e.pos}"
+                else:
+                    if isinstance(value, dict):
+                        out.write(json.dumps(value, ensure_ascii=False) + '\n')
+                        stats['records'] += 1
+                        return
+                    error = "Record is not an object"
+
+            quarantine.write(json.dumps({
+                'start': start,
+                'end': end,
+                'error': error,
+                'raw': raw.decode('utf-8', errors='replace')
+            }, ensure_ascii=False) + '\n')
+            stats['quarantined'] += 1
+
+        repair = StreamRepair(emit, max_record_bytes=max_record_bytes)
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                break
+            repair.feed(chunk)
+            stats['bytes'] += len(chunk)
+
+            now = time.perf_counter()
+            if now - last_report >= progress_every:
+                rate = stats['bytes'] / (now - started) / 2 ** 20
+                print(f"  {stats['bytes'] / 2 ** 20:.0f} MB read, {stats['records']} records, "
+                      f"{stats['quarantined']} quarantined ({rate:.1f} MB/s)")
+                last_report = now
+        repair.close()
+
+    elapsed = time.perf_counter() - started
+    stats['seconds'] = round(elapsed, 2)
+    stats['mb_per_second'] = round(stats['bytes'] / 2 ** 20 / elapsed, 1) if elapsed else None
+    print(f"Wrote {stats['records']} records in {elapsed:.1f}s ({stats['mb_per_second']} MB/s); "
+          f"{stats['quarantined']} quarantined")
+    if not stats['quarantined']:
+        os.remove(quarantine_file)
+    return stats
+
+
 if __name__ == "__main__":
-    import sys
-    
-    if len(sys.argv) > 1:
-        input_file = sys.argv[1]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fix JSON file with invalid control characters")
+    parser.add_argument("input_file", nargs="?")
+    parser.add_argument("--stream", action="store_true",
+                        help="Repair chunk by chunk and write NDJSON, quarantining records that still do not parse")
+    parser.add_argument("--output", help="Output path (default: <input>.fixed.json, or <input>.ndjson with --stream)")
+    parser.add_argument("--quarantine", help="Where --stream writes unparseable records (default: <output>.quarantine)")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="Bytes read per chunk with --stream")
+    args = parser.parse_args()
+
+    input_file = args.input_file or input("Enter the path to your JSON file: ")
+    if args.stream:
+        repair_json_stream(input_file, args.output, args.quarantine, chunk_size=args.chunk_size)
     else:
-        input_file = input("Enter the path to your JSON file: ")
-    
-    output_file = input_file + '.fixed.json'
-    fix_json_file(input_file, output_file)
\ No newline at end of file
+        fix_json_file(input_file, args.output or input_file + '.fixed.json')
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Grant-level aggregation of chunk search results
+"""
+
+# Chunks fetched per requested grant on the first search pass
+OVERFETCH_FACTOR = 4
+
+
+class ChunkMap:
+    """Ordered FAISS positions of every chunk belonging to each program_id."""
+
+    def __init__(self, db):
+        self.db = db
+        self.positions = {}
+        for position in range(db.index.ntotal):
+            doc = db.docstore.search(db.index_to_docstore_id[position])
+            program_id = (getattr(doc, "metadata", None) or {}).get("program_id")
+            self.positions.setdefault(str(program_id), []).append(position)
+
+    def chunks(self, program_id):
+        return [
+            self.db.docstore.search(self.db.index_to_docstore_id[position])
+            for position in self.positions.get(str(program_id), [])
+        ]
+
+    def full_text(self, program_id):
+        return merge_chunks([doc.page_content for doc in self.chunks(program_id)])
+
+
+def merge_chunks(texts, max_overlap=400):
+    """
+    Reassemble a document from consecutive, overlapping splitter chunks.
+
+    Each chunk is joined to the running text at the longest suffix/prefix
+    overlap (bounded by ``max_overlap``); chunks without overlap are joined
+    with a newline.
+    """
+    if not texts:
+        return ""
+
+    merged = texts[0]
+    for text in texts[1:]:
+        overlap = 0
+        for size in range(min(len(merged), len(text), max_overlap), 0, -1):
+            if merged.endswith(text[:size]):
+                overlap = size
+                break
+        merged += text[overlap:] if overlap else "\n" + text
+    return merged
+
+
+def distance_to_similarity(distance):
+    return 1.0 / (1.0 + max(float(distance), 0.0))
+
+
+def aggregate_hits(hits, fusion="max", to_similarity=distance_to_similarity):
+    """
+    Group (Document, score) chunk hits by program_id and fuse their scores.
+
+    ``to_similarity`` turns a raw score into a higher-is-better similarity;
+    the default treats scores as FAISS L2 distances. ``fusion`` is "max"
+    (the best chunk decides) or "sum" (every matching chunk adds its
+    similarity, favouring grants that match in several places). Returns
+    grants best first as dicts with the best chunk, its raw score, the
+    fused score and the number of matching chunks.
+    """
+    if fusion not in ("max", "sum"):
+        raise ValueError("fusion must be 'max' or 'sum'")
+
+    grants = {}
+    for doc, score in hits:
+        program_id = str(doc.metadata.get("program_id"))
+        similarity = to_similarity(score)
+        grant = grants.get(program_id)
+        if grant is None:
+            grants[program_id] = {
+                "doc": doc,
+                "score": float(score),
+                "similarity": similarity,
+                "fused_score": similarity,
+                "matched_chunks": 1
+            }
+            continue
+
+        grant["matched_chunks"] += 1
+        if fusion == "sum":
+            grant["fused_score"] += similarity
+        else:
+            grant["fused_score"] = max(grant["fused_score"], similarity)
+        if similarity > grant["similarity"]:
+            grant["doc"] = doc
+            grant["score"] = float(score)
+            grant["similarity"] = similarity
+
+    return sorted(grants.values(), key=lambda grant: grant["fused_score"], reverse=True)
+
+
+def initial_fetch(k, total):
+    """Chunks search_distinct_grants asks for on its first pass."""
+    return min(max(k * OVERFETCH_FACTOR, k), total)
+
+
+def search_distinct_grants(search, k, total, fusion="max", to_similarity=distance_to_similarity):
+    """
+    Return the top ``k`` distinct grants from a chunk-level ``search(n)``.
+
+    Starts by fetching ``k * OVERFETCH_FACTOR`` chunks and doubles the fetch
+    while fewer than ``k`` distinct grants have been found, stopping once
+    every chunk (``total``) has been considered.
+    """
+    fetch_k = initial_fetch(k, total)
+    while True:
+        hits = search(fetch_k)
+        grants = aggregate_hits(hits, fusion, to_similarity)
+        if len(grants) >= k or fetch_k >= total or len(hits) < fetch_k:
+            return grants[:k]
+        fetch_k = min(fetch_k * 2, total)
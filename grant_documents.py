@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+Loading grant records and rendering them into documents and chunks for the index
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# How grants become chunks: "full" renders every field, "compact" only the non-empty ones with
+# whitespace collapsed; "chars" splits on 1000 characters, "tokens" on the embedding model's tokens
+RENDER_MODE = os.environ.get("GRANT_RENDER_MODE", "full")
+CHUNKER = os.environ.get("GRANT_CHUNKER", "chars")
+
+# What every index was built with before the pipeline was recorded in its manifest
+LEGACY_PIPELINE = {"render": "full", "chunker": "chars"}
+
+# all-MiniLM-L6-v2 silently truncates input beyond 256 tokens, [CLS] and [SEP] included
+EMBEDDING_TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_EMBEDDING_TOKENS = 256
+TOKEN_CHUNK_OVERLAP = 32
+
+# Field labels in rendering order, shared by both renderers and by the rule-based classifier's parser
+RENDERED_FIELDS = (
+    ("Program Name", "program_name"),
+    ("Program Source", "program_source"),
+    ("Program Type", "program_type"),
+    ("Program Target", "program_target"),
+    ("Description", "description"),
+    ("Program Status", "program_status"),
+    ("Main Industry", "main_industry"),
+    ("Location", "location"),
+    ("Country", "country"),
+    ("Min Employees", "min_employees"),
+    ("Max Employees", "max_employees"),
+    ("Min Revenue", "min_revenue"),
+    ("Max Revenue", "max_revenue"),
+    ("Target Audience", "target_audience"),
+    ("Open Date", "open_date"),
+    ("Close Date", "close_date"),
+    ("Min Funding", "min_funding"),
+    ("Max Funding", "max_funding"),
+    ("Amount", "amount"),
+    ("Unit", "unit"),
+    ("Selling Internationally", "selling_internationally"),
+    ("Incorporated", "incorporated"),
+    ("For Profit", "for_profit"),
+    ("Indigenous Group", "indigenous_group"),
+    ("URL", "url"),
+)
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+# Start of a "Label:" line in rendered grant text
+RENDERED_LABEL_RE = re.compile(
+    r"^[ \t]*(" + "|".join(re.escape(label) for label, _ in RENDERED_FIELDS) + r"):",
+    re.MULTILINE
+)
+
+
+# Control characters the feed is known to contain; none of them are meaningful between JSON tokens
+CONTROL_CHARACTERS = dict.fromkeys([*range(0x20), 0x7F])
+
+# Characters read per buffer while streaming a JSON array
+READ_SIZE = 1 << 20
+
+# A record that has not parsed after this many characters is treated as malformed
+MAX_RECORD_CHARS = 64 << 20
+
+# A decode error this close to the end of the buffer may be a record cut off mid-token (a literal, a number's
+# fraction or exponent, a \uXXXX escape), so more is read before the record is called malformed
+TRUNCATION_MARGIN = 16
+
+# Characters that change nesting outside strings, and that end or escape within them, used to skip a malformed record
+STRUCTURE_RE = re.compile(r'[\[\]{},"]')
+STRING_END_RE = re.compile(r'["\\]')
+
+
+def report_grant_error(record, offset, message, snippet):
+    print(f"Skipping grant record {record} near character {offset}: {message}: {snippet!r}")
+
+
+# Stream grant records one at a time from a JSON array or NDJSON file
+def iter_grants(file_path, on_error=report_grant_error):
+    """
+    Yield grant dicts from ``file_path`` without reading it whole.
+
+    A file whose first character is '[' is read as a JSON array in
+    fixed-size buffers; anything else is read as NDJSON, one record per
+    line. Control characters are stripped per buffer or line, as the
+    whole-file loader used to. A record that does not parse is passed to
+    ``on_error(record, offset, message, snippet)`` and skipped, so one bad
+    grant no longer costs the whole feed. Offsets count characters after
+    control-character stripping.
+    """
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        if head == '[':
+            yield from _iter_json_array(f, on_error)
+        elif head:
+            yield from _iter_ndjson(head + f.readline(), f, on_error)
+
+
+def _iter_ndjson(first_line, f, on_error):
+    offset = 0
+    for number, line in enumerate(_chain_lines(first_line, f), start=1):
+        cleaned = line.translate(CONTROL_CHARACTERS)
+        if cleaned.strip():
+            try:
+                value = json.loads(cleaned)
+            except json.JSONDecodeError as e:
+                on_error(number, offset + e.pos, e.msg, cleaned[max(0, e.pos - 40):e.pos + 40])
+            else:
+                if isinstance(value, dict):
+                    yield value
+                else:
+                    on_error(number, offset, 'Expecting an object', cleaned[:80])
+        offset += len(cleaned)
+
+
+def _chain_lines(first_line, f):
+    yield first_line
+    yield from f
+
+
+def _iter_json_array(f, on_error):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    consumed = 0  # characters dropped from the front of the buffer so far
+    eof = False
+    record = 0
+
+    def refill():
+        nonlocal buffer, pos, consumed, eof
+        chunk = f.read(READ_SIZE)
+        eof = not chunk
+        consumed += pos
+        buffer = buffer[pos:] + chunk.translate(CONTROL_CHARACTERS)
+        pos = 0
+
+    while True:
+        # Skip whitespace and separators up to the next record
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' ,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            refill()
+        if pos >= len(buffer) or buffer[pos] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            truncated = e.msg.startswith('Unterminated string') or e.pos >= len(buffer.rstrip()) - TRUNCATION_MARGIN
+            if truncated and not eof and len(buffer) - pos < MAX_RECORD_CHARS:
+                refill()
+                continue
+
+            record += 1
+            on_error(record, consumed + e.pos, e.msg, buffer[max(pos, e.pos - 40):e.pos + 40])
+            # Resume after the comma that ends this record at the array's own depth, reading ahead (and dropping
+            # what was scanned) until it turns up; a closing bracket there ends the array
+            state = [0, False]
+            while True:
+                pos, boundary = _skip_record(buffer, pos, state)
+                if boundary is not None:
+                    break
+                if eof:
+                    return
+                refill()
+            continue
+
+        record += 1
+        if isinstance(value, dict):
+            yield value
+        else:
+            on_error(record, consumed + pos, 'Expecting an object', buffer[pos:min(end, pos + 80)])
+        pos = end
+
+
+def _skip_record(buffer, i, state):
+    """
+    Scan a malformed array record from ``i`` to the comma or bracket that ends it.
+
+    Brackets and braces are counted outside strings, so commas and
+    brackets inside nested arrays and objects are passed over. ``state``
+    holds [depth, in_string] and carries over when the buffer runs out.
+    Returns (index, boundary): ',' with the index after the comma, ']'
+    with the index of the bracket closing the array, or None with the
+    index to resume from once more has been read.
+    """
+    depth, in_string = state
+    while True:
+        if in_string:
+            match = STRING_END_RE.search(buffer, i)
+            if match is None:
+                i = len(buffer)
+                break
+            if match.group() == '\\':
+                # The escaped character may not have been read yet
+                if match.end() >= len(buffer):
+                    i = match.start()
+                    break
+                i = match.end() + 1
+            else:
+                in_string = False
+                i = match.end()
+            continue
+
+        match = STRUCTURE_RE.search(buffer, i)
+        if match is None:
+            i = len(buffer)
+            break
+        char, i = match.group(), match.end()
+        if char == '"':
+            in_string = True
+        elif char in '[{':
+            depth += 1
+        elif char in ']}':
+            if depth:
+                depth -= 1
+            elif char == ']':
+                return match.start(), ']'
+        elif not depth:
+            return i, ','
+
+    state[:] = [depth, in_string]
+    return i, None
+
+
+# Load every grant into a list
+def load_grants(file_path):
+    errors = []
+
+    def on_error(record, offset, message, snippet):
+        errors.append(record)
+        report_grant_error(record, offset, message, snippet)
+
+    grants = list(iter_grants(file_path, on_error))
+    if errors:
+        print(f"Loaded {len(grants)} grants from {file_path}; skipped {len(errors)} malformed records")
+    return grants
+
+
+# Settings that determine chunk text, recorded with an index so a change forces re-embedding
+def pipeline_settings():
+    return {"render": RENDER_MODE, "chunker": CHUNKER}
+
+
+# Process grants and create documents
+def process_grants(grants, mode=None):
+    return [render_grant(grant, mode) for grant in grants]
+
+
+# Render one grant as a document with its filterable metadata
+def render_grant(grant, mode=None):
+    mode = mode or RENDER_MODE
+    if mode == "compact":
+        grant_text = render_compact(grant)
+    elif mode == "full":
+        grant_text = render_full(grant)
+    else:
+        raise ValueError(f"Unknown render mode '{mode}'. Choose 'full' or 'compact'")
+
+    # Create a document with metadata
+    return Document(
+        page_content=grant_text,
+        metadata={
+            "program_id": grant.get('program_id', ''),
+            "program_name": grant.get('program_name', ''),
+            "program_status": grant.get('program_status', ''),
+            "location": grant.get('location', ''),
+            "country": grant.get('country', ''),
+            "target_audience": grant.get('target_audience', ''),
+            "main_industry": grant.get('main_industry', '')
+        }
+    )
+
+
+# Only the fields a grant actually has, one "Label: value" line each
+def render_compact(grant):
+    lines = []
+    for label, key in RENDERED_FIELDS:
+        value = grant.get(key)
+        value = WHITESPACE_RE.sub(" ", str(value)).strip() if value is not None else ""
+        if value:
+            lines.append(f"{label}: {value}")
+    return "\n".join(lines)
+
+
+# Compact form of already rendered grant text, such as grant content sent back by a client
+def compact_rendered_grant(text):
+    keys = dict(RENDERED_FIELDS)
+    matches = list(RENDERED_LABEL_RE.finditer(text))
+    if not matches:
+        return WHITESPACE_RE.sub(" ", text).strip()
+    # A value runs to the next label, so multi-line descriptions survive
+    fields = {
+        keys[match.group(1)]: text[match.end():following.start() if following else len(text)]
+        for match, following in zip(matches, matches[1:] + [None])
+    }
+    return render_compact(fields)
+
+
+# Every field, empty or not, as the index has always been built
+def render_full(grant):
+    # Create a comprehensive text representation of the grant: every field, empty or not, one indented line each
+    lines = "".join(f"        {label}: {grant.get(key, '')}\n" for label, key in RENDERED_FIELDS)
+    return f"\n{lines}        "
+
+
+@lru_cache(maxsize=None)
+def get_text_splitter(chunker=None):
+    chunker = chunker or CHUNKER
+    if chunker == "tokens":
+        from transformers import AutoTokenizer
+
+        # Leave room for the [CLS] and [SEP] tokens the model adds
+        return RecursiveCharacterTextSplitter.from_huggingface_tokenizer(
+            AutoTokenizer.from_pretrained(EMBEDDING_TOKENIZER),
+            chunk_size=MAX_EMBEDDING_TOKENS - 2,
+            chunk_overlap=TOKEN_CHUNK_OVERLAP,
+        )
+    if chunker != "chars":
+        raise ValueError(f"Unknown chunker '{chunker}'. Choose 'chars' or 'tokens'")
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+    )
+
+
+# Split rendered grants into chunks for embedding
+def split_grant_documents(documents, chunker=None):
+    return get_text_splitter(chunker).split_documents(documents)
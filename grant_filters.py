@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Inverted bitmap indexes over chunk metadata for filtered FAISS search
+"""
+
+import re
+
+import faiss
+import numpy as np
+
+# Public filter names mapped to the metadata keys written by process_grants
+FILTER_FIELDS = {
+    "status": "program_status",
+    "country": "country",
+    "location": "location",
+    "industry": "main_industry",
+    "target_audience": "target_audience"
+}
+
+# Fields holding comma-separated lists of values
+MULTI_VALUE_FIELDS = {"main_industry", "target_audience", "location"}
+
+
+def normalize_term(value):
+    return re.sub(r"\s+", " ", str(value)).strip().lower()
+
+
+def field_terms(field, value):
+    if value in (None, ""):
+        return []
+    if field in MULTI_VALUE_FIELDS:
+        return [normalize_term(part) for part in str(value).split(",") if part.strip()]
+    return [normalize_term(value)]
+
+
+class MetadataIndex:
+    """
+    Per-term bitmaps over FAISS vector positions.
+
+    Each (field, term) maps to a packed little-endian bitmap with one bit
+    per vector, the layout faiss.IDSelectorBitmap expects. A filter ORs
+    the bitmaps of the requested values within a field and ANDs across
+    fields, so resolving it never touches the vectors themselves.
+    """
+
+    def __init__(self, db):
+        self.size = db.index.ntotal
+        self.nbytes = (self.size + 7) // 8
+        positions = {}
+
+        for position in range(self.size):
+            doc = db.docstore.search(db.index_to_docstore_id[position])
+            metadata = getattr(doc, "metadata", None) or {}
+            for field in FILTER_FIELDS.values():
+                for term in field_terms(field, metadata.get(field)):
+                    positions.setdefault((field, term), []).append(position)
+
+        self.bitmaps = {}
+        for key, hits in positions.items():
+            mask = np.zeros(self.size, dtype=bool)
+            mask[hits] = True
+            self.bitmaps[key] = np.packbits(mask, bitorder="little")
+
+    def terms(self, field):
+        """List the distinct values indexed for a metadata field."""
+        return sorted(term for indexed_field, term in self.bitmaps if indexed_field == field)
+
+    def resolve(self, filters):
+        """
+        Combine ``filters`` ({name: value or [values]}) into a packed bitmap.
+
+        Returns None when no filter applies. Unknown filter names raise
+        ValueError so a typo does not silently return unfiltered results.
+        """
+        bitmap = None
+        for name, wanted in (filters or {}).items():
+            if name not in FILTER_FIELDS:
+                raise ValueError(f"Unknown filter '{name}'. Supported filters: {', '.join(FILTER_FIELDS)}")
+            if wanted in (None, "", []):
+                continue
+
+            field = FILTER_FIELDS[name]
+            values = wanted if isinstance(wanted, list) else [wanted]
+            field_bitmap = np.zeros(self.nbytes, dtype=np.uint8)
+            for value in values:
+                for term in field_terms(field, value):
+                    term_bitmap = self.bitmaps.get((field, term))
+                    if term_bitmap is not None:
+                        field_bitmap |= term_bitmap
+
+            bitmap = field_bitmap if bitmap is None else bitmap & field_bitmap
+        return bitmap
+
+    def count(self, bitmap):
+        return int(np.unpackbits(bitmap, bitorder="little", count=self.size).sum())
+
+
+def search_parameters(index, selector, **overrides):
+    """Build the SearchParameters subclass matching the index type, carrying the ID selector."""
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexPreTransform):
+        base = faiss.downcast_index(base.index)
+
+    # Explicit parameters replace the index's own settings, so carry those over
+    if isinstance(base, faiss.IndexIVF):
+        overrides.setdefault("nprobe", base.nprobe)
+        return faiss.SearchParametersIVF(sel=selector, **overrides)
+    if isinstance(base, faiss.IndexHNSW):
+        overrides.setdefault("efSearch", base.hnsw.efSearch)
+        return faiss.SearchParametersHNSW(sel=selector, **overrides)
+    return faiss.SearchParameters(sel=selector)
+
+
+def search_positions(db, query_vector, k, bitmap=None):
+    """
+    Search the FAISS index of a LangChain store, returning (positions, scores).
+
+    When ``bitmap`` is given the search is restricted to the vectors set in
+    it. The restriction is applied inside FAISS through an IDSelectorBitmap,
+    so the top k come only from matching vectors and nothing is over-fetched.
+    """
+    return search_positions_batch(db, [query_vector], k, bitmap)[0]
+
+
+def search_positions_batch(db, query_vectors, k, bitmap=None):
+    """
+    Search several query vectors in a single FAISS call, returning (positions, scores) per query.
+
+    FAISS applies one set of search parameters to the whole batch, so every
+    query shares ``k`` and the optional ``bitmap`` restriction.
+    """
+    params = None
+    if bitmap is not None:
+        selector = faiss.IDSelectorBitmap(db.index.ntotal, faiss.swig_ptr(bitmap))
+        params = search_parameters(db.index, selector)
+
+    vectors = np.array(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+    if getattr(db, "_normalize_L2", False):
+        faiss.normalize_L2(vectors)
+    scores, positions = db.index.search(vectors, k, params=params)
+
+    results = []
+    for row_positions, row_scores in zip(positions, scores):
+        hits = [(int(position), float(score)) for position, score in zip(row_positions, row_scores) if position != -1]
+        results.append(([position for position, _ in hits], [score for _, score in hits]))
+    return results
+
+
+def documents_at(db, positions):
+    return [db.docstore.search(db.index_to_docstore_id[position]) for position in positions]
+
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Offline precomputation of per-grant LLM insights (grant type and eligibility points)
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Stored inside the FAISS index directory so the insights travel with the index
+INSIGHTS_FILE = "grant_insights.jsonl"
+
+
+def insights_path(index_path):
+    return os.path.join(index_path, INSIGHTS_FILE)
+
+
+def load_insights(path):
+    """
+    Load precomputed insights keyed by program_id (as a string).
+
+    The file is append-only JSON lines, so a later record for the same
+    program replaces an earlier one and a torn final line is ignored.
+    """
+    insights = {}
+    if not os.path.exists(path):
+        return insights
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            insights[str(record['program_id'])] = record
+    return insights
+
+
+def drop_insights(path, program_ids):
+    """
+    Remove the insights recorded for ``program_ids`` so the next
+    precompute run analyzes those grants again. Returns how many
+    records were dropped.
+    """
+    program_ids = {str(program_id) for program_id in program_ids}
+    insights = load_insights(path)
+    stale = program_ids & insights.keys()
+    if not stale:
+        return 0
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        for program_id, record in insights.items():
+            if program_id not in stale:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+    return len(stale)
+
+
+def precompute_insights(grants, analyze, path, workers=4, refresh=False):
+    """
+    Run ``analyze(grant)`` over every grant with a thread pool and append
+    each result to ``path`` as soon as it completes.
+
+    The output file doubles as the checkpoint: grants whose program_id is
+    already recorded are skipped, so an interrupted run resumes where it
+    stopped. ``analyze`` returns a dict of insights, or None to leave the
+    grant for a later run (e.g. when the LLM call failed).
+    """
+    done = {} if refresh else load_insights(path)
+    pending = [
+        grant for grant in grants
+        if grant.get('program_id') not in (None, '') and str(grant['program_id']) not in done
+    ]
+    skipped = len(grants) - len(pending)
+    print(f"Precomputing insights for {len(pending)} grants ({skipped} already done or without program_id)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    started = time.perf_counter()
+    completed = failed = 0
+
+    with open(path, 'w' if refresh else 'a', encoding='utf-8') as out, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze, grant): grant for grant in pending}
+        for future in as_completed(futures):
+            grant = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error analyzing grant {grant.get('program_id')}: {e}")
+                result = None
+
+            if result is None:
+                failed += 1
+                continue
+
+            record = dict(result, program_id=grant['program_id'])
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            completed += 1
+
+            if completed % 25 == 0:
+                rate = completed / (time.perf_counter() - started)
+                print(f"  {completed}/{len(pending)} grants analyzed ({rate:.2f} grants/s)")
+
+    elapsed = time.perf_counter() - started
+    print(f"Precomputed insights for {completed} grants in {elapsed:.1f}s ({failed} failed)")
+    return {'completed': completed, 'failed': failed, 'skipped': skipped, 'seconds': round(elapsed, 2)}
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Rule-based grant type classifier over structured grant fields
+"""
+
+import re
+from collections import Counter
+
+from grant_documents import RENDERED_FIELDS
+
+# Target audience terms that point at organizational or individual applicants
+COMPANY_AUDIENCE_TERMS = (
+    "business", "company", "companies", "corporation", "enterprise", "sme", "startup",
+    "start-up", "organization", "organisation", "ngo", "non-profit", "nonprofit",
+    "not-for-profit", "charity", "charities", "cooperative", "co-operative", "society",
+    "association", "institution", "municipality", "manufacturer", "producer", "employer",
+    "first nation", "band council"
+)
+INDIVIDUAL_AUDIENCE_TERMS = (
+    "individual", "student", "artist", "writer", "author", "musician", "creator",
+    "senior", "youth", "graduate", "scholar", "fellow", "researcher", "resident", "person", "people",
+    "homeowner", "worker", "apprentice", "veteran", "newcomer", "immigrant", "women", "parent"
+)
+
+
+def terms_pattern(terms):
+    """Match any of ``terms`` as whole words, plural included, so "author" does not match "authorities"."""
+    return re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")(?:e?s)?\b")
+
+
+COMPANY_AUDIENCE_RE = terms_pattern(COMPANY_AUDIENCE_TERMS)
+INDIVIDUAL_AUDIENCE_RE = terms_pattern(INDIVIDUAL_AUDIENCE_TERMS)
+
+# "Label: value" lines of grant text rendered by process_grants, mapped back to grant record keys
+RENDERED_KEYS = dict(RENDERED_FIELDS)
+RENDERED_FIELD_RE = re.compile(
+    r"^\s*(" + "|".join(re.escape(label) for label in RENDERED_KEYS) + r"):[ \t]*(.*?)\s*$",
+    re.MULTILINE
+)
+
+TRUE_VALUES = {"true", "yes", "y", "1", "required"}
+
+
+def parse_rendered_grant(text):
+    """Recover grant record fields, the classifier's inputs among them, from text rendered by process_grants."""
+    return {RENDERED_KEYS[label]: value for label, value in RENDERED_FIELD_RE.findall(text)}
+
+
+def is_true(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def is_positive_number(value):
+    if value in (None, "") or isinstance(value, bool):
+        return False
+    try:
+        return float(str(value).replace(",", "").replace("$", "")) > 0
+    except ValueError:
+        return False
+
+
+def audience_terms(audience):
+    """Split a target audience string into lower-cased segments."""
+    return [part.strip().lower() for part in re.split(r"[,;/|]| and ", str(audience or "")) if part.strip()]
+
+
+def score_grant(grant):
+    """
+    Score the organizational and individual signals in a grant record.
+
+    Returns (company_score, individual_score, reasons).
+    """
+    company, individual = 0, 0
+    reasons = []
+
+    if is_true(grant.get("incorporated", "")):
+        company += 2
+        reasons.append("incorporation required")
+    if is_true(grant.get("for_profit", "")):
+        company += 2
+        reasons.append("for-profit applicants")
+
+    for field in ("min_employees", "max_employees", "min_revenue", "max_revenue"):
+        if is_positive_number(grant.get(field)):
+            company += 1
+            reasons.append(f"{field} set")
+
+    audience = " ".join(
+        str(grant.get(field) or "") for field in ("target_audience", "program_target")
+    )
+    for segment in audience_terms(audience):
+        if COMPANY_AUDIENCE_RE.search(segment):
+            company += 1
+            reasons.append(f"audience '{segment}'")
+        elif INDIVIDUAL_AUDIENCE_RE.search(segment):
+            individual += 1
+            reasons.append(f"audience '{segment}'")
+
+    return company, individual, reasons
+
+
+def classify_grant(grant, margin=2):
+    """
+    Classify a grant record as "COMPANY" or "INDIVIDUAL" from its fields.
+
+    Returns None when the signals are missing or mixed, meaning the caller
+    should ask the LLM. A side wins only when it scores at least
+    ``margin`` points and the other side has no signal at all, which
+    keeps the fast path conservative.
+    """
+    company, individual, _ = score_grant(grant)
+    if company >= margin and individual == 0:
+        return "COMPANY"
+    if individual >= margin and company == 0:
+        return "INDIVIDUAL"
+    return None
+
+
+def agreement_report(grants, llm_types, margin=2, max_examples=20):
+    """
+    Compare the rule-based classifier with LLM labels over a corpus.
+
+    ``llm_types`` maps str(program_id) to the LLM's grant type. Reports the
+    share of grants the rules decide, agreement on those, a confusion
+    table and sample disagreements for tuning the term lists.
+    """
+    confusion = Counter()
+    disagreements = []
+    decided = agreed = labelled = 0
+
+    for grant in grants:
+        llm_type = llm_types.get(str(grant.get("program_id")))
+        if llm_type is None:
+            continue
+        labelled += 1
+
+        rule_type = classify_grant(grant, margin)
+        confusion[(rule_type or "UNDECIDED", llm_type)] += 1
+        if rule_type is None:
+            continue
+
+        decided += 1
+        if rule_type == llm_type:
+            agreed += 1
+        elif len(disagreements) < max_examples:
+            disagreements.append({
+                "program_id": grant.get("program_id"),
+                "program_name": grant.get("program_name"),
+                "rules": rule_type,
+                "llm": llm_type,
+                "reasons": score_grant(grant)[2]
+            })
+
+    return {
+        "grants_labelled": labelled,
+        "coverage": round(decided / labelled, 4) if labelled else 0.0,
+        "agreement": round(agreed / decided, 4) if decided else 0.0,
+        "confusion": {f"{rule}->{llm}": count for (rule, llm), count in sorted(confusion.items())},
+        "disagreements": disagreements
+    }
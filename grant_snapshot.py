@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled, memory-mappable snapshot of the grants feed: typed columns, interned strings and raw records
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from array import array
+from collections.abc import Sequence
+
+import numpy as np
+
+from eligibility_engine import to_date, to_float, to_tristate
+from grant_documents import iter_grants
+
+SNAPSHOT_VERSION = 1
+
+FLOAT_FIELDS = ("min_employees", "max_employees", "min_revenue", "max_revenue",
+                "min_funding", "max_funding", "amount")
+TRISTATE_FIELDS = ("for_profit", "incorporated", "indigenous_group", "selling_internationally")
+DATE_FIELDS = ("open_date", "close_date")
+INTERNED_FIELDS = ("program_status", "location", "country", "main_industry", "target_audience",
+                   "program_type", "program_source", "unit")
+
+# datetime64[D] stores NaT as the smallest int64
+NAT = np.iinfo(np.int64).min
+
+
+def snapshot_path(source_path):
+    return source_path + ".snapshot"
+
+
+def source_fingerprint(source_path, with_hash=True):
+    stat = os.stat(source_path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(source_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+class StringColumn(Sequence):
+    """Variable-length UTF-8 strings stored as one byte blob plus int64 offsets."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    @classmethod
+    def load(cls, prefix, mmap_mode="r"):
+        offsets = np.load(prefix + ".offsets.npy", mmap_mode=mmap_mode)
+        if os.path.getsize(prefix + ".bin") == 0:
+            data = np.zeros(0, dtype=np.uint8)  # np.memmap refuses empty files
+        else:
+            data = np.memmap(prefix + ".bin", dtype=np.uint8, mode="r")
+        return cls(data, offsets)
+
+
+class StringColumnWriter:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.file = open(prefix + ".bin", "wb")
+        self.offsets = array("q", [0])
+
+    def append(self, text):
+        encoded = text.encode("utf-8")
+        self.file.write(encoded)
+        self.offsets.append(self.offsets[-1] + len(encoded))
+
+    def close(self):
+        self.file.close()
+        np.save(self.prefix + ".offsets.npy", np.frombuffer(self.offsets, dtype=np.int64))
+
+
+class JsonColumn(Sequence):
+    """JSON values stored as a StringColumn and decoded one at a time."""
+
+    def __init__(self, strings):
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, i):
+        return json.loads(self.strings[i])
+
+
+class GrantSnapshot(Sequence):
+    """
+    Read-only view of a compiled grants feed.
+
+    Typed columns (``floats``, ``tristates``, ``dates``) and interned
+    string codes (``codes`` with ``tables``) are memory-mapped NumPy
+    arrays, ready for vectorized filtering without touching the records.
+    Indexing returns the original grant dict, decoded only on access, so
+    code written against a list of grants keeps working.
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.size = meta["count"]
+        self.floats = {field: np.load(self._file(field + ".npy"), mmap_mode="r") for field in FLOAT_FIELDS}
+        self.tristates = {field: np.load(self._file(field + ".npy"), mmap_mode="r") for field in TRISTATE_FIELDS}
+        self.dates = {field: np.load(self._file(field + ".npy"), mmap_mode="r") for field in DATE_FIELDS}
+        self.codes = {field: np.load(self._file(field + ".npy"), mmap_mode="r") for field in INTERNED_FIELDS}
+        self.tables = {field: list(StringColumn.load(self._file(field + ".table"))) for field in INTERNED_FIELDS}
+        self.program_names = StringColumn.load(self._file("program_name"))
+        self.program_ids = JsonColumn(StringColumn.load(self._file("program_id")))
+        self.records = JsonColumn(StringColumn.load(self._file("records")))
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        return self.records[i]
+
+
+def build_snapshot(source_path, path=None):
+    """
+    Compile ``source_path`` (a JSON array or NDJSON feed) into a snapshot directory.
+
+    Grants are streamed, so memory grows with the typed columns rather
+    than the JSON text. The snapshot is written to a temporary directory
+    and swapped in whole.
+    """
+    path = path or snapshot_path(source_path)
+    started = time.perf_counter()
+    fingerprint = source_fingerprint(source_path)
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    floats = {field: array("d") for field in FLOAT_FIELDS}
+    tristates = {field: array("b") for field in TRISTATE_FIELDS}
+    dates = {field: array("q") for field in DATE_FIELDS}
+    codes = {field: array("i") for field in INTERNED_FIELDS}
+    tables = {field: {} for field in INTERNED_FIELDS}
+    strings = {name: StringColumnWriter(os.path.join(tmp_path, name))
+               for name in ("program_name", "program_id", "records")}
+
+    count = 0
+    for grant in iter_grants(source_path):
+        for field in FLOAT_FIELDS:
+            floats[field].append(to_float(grant.get(field)))
+        for field in TRISTATE_FIELDS:
+            tristates[field].append(to_tristate(grant.get(field)))
+        for field in DATE_FIELDS:
+            day = to_date(grant.get(field))
+            dates[field].append(NAT if np.isnat(day) else int(day.astype(np.int64)))
+        for field in INTERNED_FIELDS:
+            table = tables[field]
+            codes[field].append(table.setdefault(str(grant.get(field) or "").strip(), len(table)))
+        strings["program_name"].append(str(grant.get("program_name", "")))
+        strings["program_id"].append(json.dumps(grant.get("program_id"), ensure_ascii=False))
+        strings["records"].append(json.dumps(grant, ensure_ascii=False))
+        count += 1
+
+    for field, values in floats.items():
+        np.save(os.path.join(tmp_path, field + ".npy"), np.frombuffer(values, dtype=np.float64))
+    for field, values in tristates.items():
+        np.save(os.path.join(tmp_path, field + ".npy"), np.frombuffer(values, dtype=np.int8))
+    for field, values in dates.items():
+        np.save(os.path.join(tmp_path, field + ".npy"), np.frombuffer(values, dtype=np.int64).view("datetime64[D]"))
+    for field, values in codes.items():
+        np.save(os.path.join(tmp_path, field + ".npy"), np.frombuffer(values, dtype=np.int32))
+        table_writer = StringColumnWriter(os.path.join(tmp_path, field + ".table"))
+        for value in tables[field]:
+            table_writer.append(value)
+        table_writer.close()
+    for writer in strings.values():
+        writer.close()
+
+    with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": SNAPSHOT_VERSION, "count": count, "source": fingerprint}, f)
+
+    # Directories cannot be replaced atomically; readers that miss the window fall back to JSON
+    old_path = path + ".old"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    if os.path.exists(old_path):
+        shutil.rmtree(old_path)
+    print(f"Compiled {count} grants into {path} in {time.perf_counter() - started:.1f}s")
+    return count
+
+
+def load_snapshot(source_path, path=None):
+    """
+    Open the snapshot of ``source_path``, or return None if it is missing or stale.
+
+    A snapshot is fresh when the source's size and mtime match the ones
+    it was built from, or, failing that, its SHA-256 does (a touched but
+    unchanged feed does not force a rebuild).
+    """
+    path = path or snapshot_path(source_path)
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path) or not os.path.exists(source_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    built_from = meta["source"]
+    current = source_fingerprint(source_path, with_hash=False)
+    if (current["size"], current["mtime_ns"]) != (built_from["size"], built_from["mtime_ns"]):
+        if current["size"] != built_from["size"] or \
+                source_fingerprint(source_path)["sha256"] != built_from["sha256"]:
+            print(f"Grants snapshot {path} is stale")
+            return None
+        # Same content under a new mtime: remember it so the next start skips the hash
+        meta["source"] = dict(built_from, mtime_ns=current["mtime_ns"])
+        try:
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(meta_path + ".tmp", meta_path)
+        except OSError:
+            pass
+    return GrantSnapshot(path, meta)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from grant_documents import load_grants
+
+    source = sys.argv[1] if len(sys.argv) > 1 else "grantss.json"
+    build_snapshot(source)
+
+    started = time.perf_counter()
+    grants = load_grants(source)
+    json_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    snapshot = load_snapshot(source)
+    snapshot_seconds = time.perf_counter() - started
+    print(f"Loaded {len(grants)} grants from JSON in {json_seconds * 1000:.1f} ms, "
+          f"{len(snapshot)} from the snapshot in {snapshot_seconds * 1000:.1f} ms")
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental FAISS index updates keyed on program_id and rendered-content hash
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import faiss
+
+MANIFEST_FILE = "manifest.json"
+
+
+def grant_key(metadata):
+    """Key a grant (or one of its chunks) by program_id, falling back to its name."""
+    program_id = metadata.get("program_id")
+    if program_id in (None, ""):
+        return "name:" + str(metadata.get("program_name", ""))
+    return str(program_id)
+
+
+def group_documents(documents):
+    """Group rendered grants by key; a feed can repeat a program_id."""
+    groups = {}
+    for doc in documents:
+        groups.setdefault(grant_key(doc.metadata), []).append(doc)
+    return groups
+
+
+def document_hash(doc):
+    material = doc.page_content + "\x00" + json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def combine_hashes(hashes):
+    """Hash of a grant group from its per-document hashes, so it can be computed while streaming."""
+    return hashlib.sha256("".join(hashes).encode("ascii")).hexdigest()
+
+
+def content_hash(docs):
+    """Hash of the rendered text and metadata of every grant sharing a key."""
+    return combine_hashes(document_hash(doc) for doc in docs)
+
+
+def load_manifest(index_path):
+    path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(index_path, manifest):
+    path = os.path.join(index_path, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def build_manifest(db, documents=(), version=1, pipeline=None):
+    """
+    Describe a store: each grant's content hash and chunk IDs.
+
+    ``documents`` are the per-grant documents from process_grants that the
+    store was built from; chunk IDs are grouped by the key in each chunk's
+    metadata. For an index built before manifests existed, pass no
+    documents: every grant then has an unknown hash and is re-embedded on
+    the first sync. ``pipeline`` records how the documents were rendered
+    and chunked (grant_documents.pipeline_settings).
+    """
+    hashes = {key: content_hash(docs) for key, docs in group_documents(documents).items()}
+    doc_ids = {}
+    for doc_id in db.index_to_docstore_id.values():
+        doc_ids.setdefault(grant_key(db.docstore.search(doc_id).metadata), []).append(doc_id)
+
+    return {
+        "version": version,
+        "updated_at": time.time(),
+        "pipeline": pipeline,
+        "grants": {
+            key: {"hash": hashes.get(key), "doc_ids": doc_ids.get(key, [])}
+            for key in hashes.keys() | doc_ids.keys()
+        }
+    }
+
+
+def plan_sync(groups, manifest):
+    """
+    Compare grouped grants against the manifest.
+
+    Returns (added, changed, deleted): lists of keys for grants that are
+    new, whose content hash changed, or that no longer exist.
+    """
+    known = manifest["grants"]
+    added = [key for key in groups if key not in known]
+    changed = [key for key, docs in groups.items() if key in known and known[key]["hash"] != content_hash(docs)]
+    deleted = [key for key in known if key not in groups]
+    return added, changed, deleted
+
+
+def sync_index(db, documents, manifest, split, pipeline=None):
+    """
+    Bring ``db`` in line with ``documents``, embedding only new or changed grants.
+
+    Chunks of changed and deleted grants are removed from the index and
+    docstore, then the new and changed grants are chunked with ``split``
+    and added in one embedding pass. If ``pipeline`` differs from the one
+    the manifest was built with, every grant counts as changed. Returns
+    the updated manifest, a summary, and the keys of every grant that was
+    touched.
+    """
+    started = time.perf_counter()
+    groups = group_documents(documents)
+    if manifest.get("pipeline") != pipeline:
+        print(f"Rendering or chunking changed ({manifest.get('pipeline')} -> {pipeline}); re-embedding every grant")
+        manifest = dict(manifest, grants={
+            key: dict(entry, hash=None) for key, entry in manifest["grants"].items()
+        })
+    added, changed, deleted = plan_sync(groups, manifest)
+    grants = dict(manifest["grants"])
+
+    stale_ids = [doc_id for key in changed + deleted for doc_id in grants.pop(key)["doc_ids"]]
+    if stale_ids:
+        # Only flat indexes renumber positions on removal the way the docstore mapping assumes;
+        # IVF keeps the old labels and HNSW cannot remove at all
+        if not isinstance(faiss.downcast_index(db.index), faiss.IndexFlat):
+            raise ValueError(
+                f"{len(changed) + len(deleted)} grants changed or were removed, but vectors can only be "
+                f"removed from a flat index; rebuild the index instead"
+            )
+        db.delete(stale_ids)
+
+    chunks, chunk_ids = [], []
+    for key in added + changed:
+        entry = grants[key] = {"hash": content_hash(groups[key]), "doc_ids": []}
+        for chunk in split(groups[key]):
+            chunk_id = str(uuid.uuid4())
+            chunks.append(chunk)
+            chunk_ids.append(chunk_id)
+            entry["doc_ids"].append(chunk_id)
+    if chunks:
+        db.add_documents(chunks, ids=chunk_ids)
+
+    touched = added + changed + deleted
+    new_manifest = {
+        "version": manifest.get("version", 0) + (1 if touched else 0),
+        "updated_at": time.time(),
+        "pipeline": pipeline,
+        "grants": grants
+    }
+    summary = {
+        "added": len(added),
+        "changed": len(changed),
+        "deleted": len(deleted),
+        "unchanged": len(groups) - len(added) - len(changed),
+        "chunks_removed": len(stale_ids),
+        "chunks_embedded": len(chunks),
+        "seconds": round(time.perf_counter() - started, 2),
+        "version": new_manifest["version"]
+    }
+    return new_manifest, summary, touched
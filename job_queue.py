@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent, prioritized background job queue for long-running generations backed by SQLite
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    output TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    error TEXT,
+    stats TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, seq);
+"""
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobContext:
+    """
+    What a handler sees of its job: the payload, emit() for partial output
+    and stats for timing details. Partial output is flushed to the store
+    every ``flush_every`` seconds, and each flush also checks for a
+    cancellation request; emit() raises JobCancelled once one is seen.
+    """
+
+    def __init__(self, queue, job_id, payload, flush_every):
+        self.queue = queue
+        self.id = job_id
+        self.payload = payload
+        self.stats = {}
+        self.flush_every = flush_every
+        self._parts = []
+        self._flushed = 0
+        self._last_flush = time.monotonic()
+
+    @property
+    def output(self):
+        return "".join(self._parts)
+
+    def emit(self, text):
+        self._parts.append(text)
+        if time.monotonic() - self._last_flush >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if len(self._parts) > self._flushed:
+            self.queue.store.append_output(self.id, "".join(self._parts[self._flushed:]))
+            self._flushed = len(self._parts)
+        else:
+            self.queue.store.heartbeat(self.id)
+        self.queue.notify()
+        if self.cancelled():
+            raise JobCancelled()
+
+    def cancelled(self):
+        return self.id in self.queue.cancelling or self.queue.store.cancel_requested(self.id)
+
+
+class JobStore:
+    """
+    Job records in SQLite, one row per job with its payload, partial output,
+    result and timestamps. Runs in WAL mode with one connection per thread,
+    like the LLM cache, so pollers never block the workers.
+    """
+
+    def __init__(self, path="jobs.sqlite3"):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def create(self, kind, payload, priority=0):
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, priority, json.dumps(payload), time.time())
+            )
+        return job_id
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else describe(row)
+
+    def list(self, status=None, limit=50):
+        conn = self._connect()
+        if status:
+            rows = conn.execute("SELECT * FROM jobs WHERE status = ? ORDER BY seq DESC LIMIT ?", (status, limit))
+        else:
+            rows = conn.execute("SELECT * FROM jobs ORDER BY seq DESC LIMIT ?", (limit,))
+        return [describe(row, with_output=False) for row in rows]
+
+    def count(self, status):
+        return self._connect().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def position(self, job_id):
+        """1-based place of a queued job in the order workers will take it, or None."""
+        conn = self._connect()
+        row = conn.execute("SELECT priority, seq FROM jobs WHERE id = ? AND status = ?", (job_id, QUEUED)).fetchone()
+        if row is None:
+            return None
+        ahead = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority > ? OR (priority = ? AND seq < ?))",
+            (QUEUED, row[0], row[0], row[1])
+        ).fetchone()[0]
+        return ahead + 1
+
+    def claim(self):
+        """Mark the highest-priority queued job running and return (id, kind, payload), or None."""
+        conn = self._connect()
+        while True:
+            row = conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = ? ORDER BY priority DESC, seq LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            with conn:
+                claimed = conn.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ?, attempts = attempts + 1 "
+                    "WHERE id = ? AND status = ?",
+                    (RUNNING, now, now, row[0], QUEUED)
+                ).rowcount
+            # Another worker (or process) got there first; try the next one
+            if claimed:
+                return row[0], row[1], json.loads(row[2])
+
+    def append_output(self, job_id, text):
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE jobs SET output = output || ?, heartbeat_at = ? WHERE id = ?",
+                         (text, time.time(), job_id))
+
+    def heartbeat(self, job_id):
+        conn = self._connect()
+        with conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id, status, output=None, result=None, error=None, stats=None):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, output = COALESCE(?, output), result = ?, error = ?, stats = ?, "
+                "finished_at = ? WHERE id = ?",
+                (status, output, None if result is None else json.dumps(result), error,
+                 None if stats is None else json.dumps(stats), time.time(), job_id)
+            )
+
+    def request_cancel(self, job_id):
+        """Cancel a queued job outright, or flag a running one. Returns the resulting status, or None."""
+        conn = self._connect()
+        with conn:
+            cancelled = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED)
+            ).rowcount
+            if not cancelled:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def cancel_requested(self, job_id):
+        row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def requeue_stale(self, lease):
+        """Put back jobs left running by a process that stopped heartbeating ``lease`` seconds ago."""
+        conn = self._connect()
+        with conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, heartbeat_at = NULL, output = '' "
+                "WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, time.time() - lease)
+            ).rowcount
+
+    def prune(self, max_age):
+        """Delete finished jobs older than ``max_age`` seconds."""
+        conn = self._connect()
+        with conn:
+            return conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished_at < ?",
+                (*FINISHED, time.time() - max_age)
+            ).rowcount
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+def describe(row, with_output=True):
+    """API view of a job row, with queue wait and run time in milliseconds."""
+    started, finished = row["started_at"], row["finished_at"]
+    job = {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "priority": row["priority"],
+        "attempts": row["attempts"],
+        "created_at": row["created_at"],
+        "started_at": started,
+        "finished_at": finished,
+        "queue_ms": round(((started or finished or time.time()) - row["created_at"]) * 1000, 1),
+        "run_ms": round(((finished or time.time()) - started) * 1000, 1) if started else None,
+        "error": row["error"],
+        "stats": json.loads(row["stats"]) if row["stats"] else None,
+        "result": json.loads(row["result"]) if row["result"] else None
+    }
+    if with_output:
+        job["output"] = row["output"]
+    return job
+
+
+class JobQueue:
+    """
+    A fixed pool of worker threads running jobs from a JobStore.
+
+    Handlers are registered per job kind and called with a JobContext;
+    whatever they return is stored as the job's result. Workers take the
+    highest priority first, oldest first within a priority. At most
+    ``max_queued`` jobs wait at once; submit() raises QueueFull beyond
+    that. A heartbeat thread refreshes every running job several times per
+    lease, whether or not the handler emits output; a job whose heartbeat
+    is older than ``lease`` seconds (its process died mid-run) is queued
+    again by an idle worker and rerun from the start. Finished jobs older
+    than ``retention`` seconds are deleted by the same sweep.
+    """
+
+    def __init__(self, store, workers=2, max_queued=100, lease=300, flush_every=0.5, retention=7 * 24 * 3600):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.lease = lease
+        self.flush_every = flush_every
+        self.retention = retention
+        self.handlers = {}
+        self.cancelling = set()
+        self.running = set()
+        self._condition = threading.Condition()
+        self._start_lock = threading.Lock()
+        self._threads = []
+        self._stopping = False
+        self._last_sweep = 0.0
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Start the workers; later calls do nothing."""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._last_sweep = time.monotonic()
+            requeued = self.store.requeue_stale(self.lease)
+            if requeued:
+                print(f"Requeued {requeued} jobs interrupted by a restart")
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stopping = True
+        self.notify()
+
+    def submit(self, kind, payload, priority=0):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        if self.store.count(QUEUED) >= self.max_queued:
+            raise QueueFull(f"{self.max_queued} jobs are already queued")
+        job_id = self.store.create(kind, payload, priority)
+        self.notify()
+        return job_id
+
+    def cancel(self, job_id):
+        status = self.store.request_cancel(job_id)
+        if status == RUNNING:
+            self.cancelling.add(job_id)
+        self.notify()
+        return status
+
+    def notify(self):
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, timeout):
+        """Block until a job changes (in this process) or ``timeout`` passes."""
+        with self._condition:
+            self._condition.wait(timeout)
+
+    def _work(self):
+        while not self._stopping:
+            claimed = self.store.claim()
+            if claimed is None:
+                self._sweep()
+                # Jobs submitted by another process only show up on the next poll
+                self.wait(1.0)
+                continue
+            self._run(*claimed)
+
+    def _heartbeat(self):
+        # A handler can go far longer than the lease between outputs (one slow LLM call, waiting for a slot)
+        while not self._stopping:
+            time.sleep(self.lease / 4)
+            for job_id in list(self.running):
+                self.store.heartbeat(job_id)
+
+    def _sweep(self):
+        # A restart within the lease leaves jobs that look alive; keep checking until they expire
+        with self._start_lock:
+            if time.monotonic() - self._last_sweep < self.lease / 4:
+                return
+            self._last_sweep = time.monotonic()
+        requeued = self.store.requeue_stale(self.lease)
+        if requeued:
+            print(f"Requeued {requeued} jobs whose worker stopped responding")
+            self.notify()
+        if self.retention:
+            self.store.prune(self.retention)
+
+    def _run(self, job_id, kind, payload):
+        context = JobContext(self, job_id, payload, self.flush_every)
+        self.running.add(job_id)
+        try:
+            result = self.handlers[kind](context)
+            self.store.finish(job_id, SUCCEEDED, context.output, result=result, stats=context.stats)
+        except JobCancelled:
+            self.store.finish(job_id, CANCELLED, context.output, stats=context.stats)
+        except Exception as e:
+            traceback.print_exc()
+            self.store.finish(job_id, FAILED, context.output, error=f"{type(e).__name__}: {e}", stats=context.stats)
+        finally:
+            self.running.discard(job_id)
+            self.cancelling.discard(job_id)
+            self.notify()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "queued": self.store.count(QUEUED),
+            "running": self.store.count(RUNNING)
+        }
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent, content-addressed cache for LLM generations backed by SQLite
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def make_key(model, template_version, prompt, **params):
+    """
+    Hash everything that determines a generation into a cache key.
+
+    ``params`` covers request options such as a JSON ``format`` that change
+    the output for an otherwise identical prompt.
+    """
+    material = json.dumps(
+        {"model": model, "template_version": template_version, "prompt": prompt, "params": params},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Disk-backed LRU cache with TTL expiry and a total size cap.
+
+    The database runs in WAL mode with a busy timeout, so several server
+    processes can share one cache file. Each thread gets its own connection.
+    Hit, miss and eviction counters are kept per process.
+    """
+
+    def __init__(self, path="llm_cache.sqlite3", ttl=7 * 24 * 3600,
+                 max_bytes=256 * 1024 * 1024, evict_every=50):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        conn.commit()
+
+    def get(self, key):
+        """Return the cached value for ``key`` or None if absent or expired."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None or (self.ttl and now - row[1] > self.ttl):
+            if row is not None:
+                with conn:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with conn:
+            conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, value):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode("utf-8")), now, now)
+            )
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under the size cap."""
+        conn = self._connect()
+        removed = 0
+        with conn:
+            if self.ttl:
+                removed += conn.execute(
+                    "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,)
+                ).rowcount
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                stale_keys = []
+                for key, size in conn.execute("SELECT key, size FROM llm_cache ORDER BY accessed_at"):
+                    stale_keys.append((key,))
+                    excess -= size
+                    if excess <= 0:
+                        break
+                conn.executemany("DELETE FROM llm_cache WHERE key = ?", stale_keys)
+                removed += len(stale_keys)
+
+        with self._lock:
+            self.evictions += removed
+        return removed
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def stats(self):
+        conn = self._connect()
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+        ).fetchone()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "size_bytes": total,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl
+            }
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
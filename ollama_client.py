@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Pooled, timeout-aware client for the Ollama chat API
+"""
+
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# HTTP status codes worth retrying: rate limiting and transient upstream failures
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class OllamaError(Exception):
+    """Raised when Ollama cannot produce a response."""
+
+
+class OllamaBusyError(OllamaError):
+    """Raised when no generation slot frees up within the queue timeout."""
+
+
+class OllamaRequestError(OllamaError):
+    """Raised when Ollama rejects the request itself (a 4xx status other than 429), so retrying cannot help."""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaClient:
+    """
+    Thread-safe Ollama chat client shared by every request handler.
+
+    Connections are kept alive in a pool, connect and read timeouts are
+    enforced separately, the number of in-flight generations is capped by a
+    semaphore and transient failures are retried with jittered exponential
+    backoff. Point ``api_url`` at a local stub server to exercise it in tests.
+    """
+
+    def __init__(self, api_url, model, pool_size=10, connect_timeout=3.05,
+                 read_timeout=120, max_concurrency=4, queue_timeout=30,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0):
+        self.api_url = api_url
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._session = requests.Session()
+        self._session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def build_payload(self, prompt, model=None, stream=False, format=None, options=None):
+        payload = {
+            "model": model or self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": stream
+        }
+        if format is not None:
+            payload["format"] = format
+        if options:
+            payload["options"] = options
+        return payload
+
+    def chat(self, prompt, model=None, format=None, options=None):
+        """Run a non-streaming chat completion and return Ollama's JSON reply."""
+        payload = self.build_payload(prompt, model, False, format, options)
+        with self._slot():
+            response = self._post(payload, stream=False)
+            try:
+                return response.json()
+            except ValueError as e:
+                raise OllamaError(f"Invalid JSON from Ollama: {e}") from e
+
+    def generate(self, prompt, model=None, format=None, options=None):
+        """Run a non-streaming chat completion and return the message text."""
+        reply = self.chat(prompt, model, format, options)
+        try:
+            return reply["message"]["content"]
+        except (KeyError, TypeError) as e:
+            raise OllamaError(f"Unexpected response from Ollama: {reply}") from e
+
+    def stream(self, prompt, model=None, format=None, options=None):
+        """
+        Stream a chat completion, yielding each decoded chunk from Ollama.
+
+        The generation slot is held until the generator is exhausted or closed.
+        Retries only happen before the first chunk is received.
+        """
+        payload = self.build_payload(prompt, model, True, format, options)
+        with self._slot():
+            response = self._post(payload, stream=True)
+            with response:
+                try:
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            raise OllamaError(chunk["error"])
+                        yield chunk
+                        if chunk.get("done"):
+                            break
+                except requests.RequestException as e:
+                    raise OllamaError(f"Stream from Ollama interrupted: {e}") from e
+
+    def list_models(self, timeout=None):
+        """Return the names of the models the server has pulled (GET /api/tags), without retries."""
+        url = self.api_url.rsplit("/api/", 1)[0] + "/api/tags"
+        try:
+            response = self._session.get(url, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            return [model["name"] for model in response.json().get("models", [])]
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            raise OllamaError(f"Error listing Ollama models: {e}") from e
+
+    def close(self):
+        self._session.close()
+
+    def _slot(self):
+        return _Slot(self._slots, self.queue_timeout)
+
+    def _post(self, payload, stream):
+        attempt = 0
+        while True:
+            try:
+                response = self._session.post(
+                    self.api_url, json=payload, timeout=self.timeout, stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = OllamaError(f"Error calling Ollama API: {e}")
+            else:
+                if response.status_code < 400:
+                    return response
+                message = f"Ollama API returned {response.status_code}: {response.text[:200]}"
+                response.close()
+                if response.status_code not in RETRY_STATUS_CODES:
+                    if response.status_code < 500:
+                        raise OllamaRequestError(message, response.status_code)
+                    raise OllamaError(message)
+                error = OllamaError(message)
+
+            if attempt >= self.max_retries:
+                raise error
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _backoff(self, attempt):
+        # Full jitter: sleep a random amount up to the exponential cap
+        cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, cap)
+
+
+class _Slot:
+    """Context manager that acquires a generation slot or raises OllamaBusyError."""
+
+    def __init__(self, semaphore, timeout):
+        self.semaphore = semaphore
+        self.timeout = timeout
+
+    def __enter__(self):
+        if not self.semaphore.acquire(timeout=self.timeout):
+            raise OllamaBusyError("All Ollama generation slots are busy")
+        return self
+
+    def __exit__(self, *exc_info):
+        self.semaphore.release()
+        return False
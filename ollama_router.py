@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Load balancing of Ollama generations across several backends, with health checks and per-model routing
+"""
+
+import math
+import random
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from ollama_client import OllamaBusyError, OllamaClient, OllamaError, OllamaRequestError
+
+LEAST_OUTSTANDING, WEIGHTED = "least_outstanding", "weighted"
+
+# Latencies kept per backend for the percentile stats
+LATENCY_WINDOW = 256
+
+
+def parse_backends(spec):
+    """
+    Parse "url[*weight],url[*weight],..." into [(chat_url, weight)].
+
+    A URL may be a server root (http://gpu1:11434) or its chat endpoint
+    (http://gpu1:11434/api/chat); weights default to 1 and must be positive.
+    """
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.partition("*")
+        url = url.rstrip("/")
+        if not url.endswith("/api/chat"):
+            url += "/api/chat"
+        try:
+            weight = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight '{weight}' for Ollama backend {url}") from None
+        if not (weight > 0 and math.isfinite(weight)):
+            raise ValueError(f"Weight for Ollama backend {url} must be a positive number, got {weight}")
+        backends.append((url, weight))
+    if not backends:
+        raise ValueError("No Ollama backends configured")
+    return backends
+
+
+def serves(models, model):
+    """Whether a backend listing ``models`` (None: not yet known) can run ``model``."""
+    if models is None:
+        return True
+    if model in models:
+        return True
+    # Ollama lists "llama3.2:latest" for a model requested as "llama3.2"
+    return ":" not in model and f"{model}:latest" in models
+
+
+def load(backend):
+    """In-flight requests per unit of weight."""
+    return backend.outstanding / backend.weight
+
+
+class Backend:
+    def __init__(self, url, weight, client):
+        self.url = url
+        self.weight = weight
+        self.client = client
+        self.healthy = True
+        self.models = None
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_at = None
+        self.last_error = None
+        self.last_check = None
+        self.current_weight = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.first_chunk_latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "weight": self.weight,
+            "healthy": self.healthy,
+            "models": sorted(self.models) if self.models is not None else None,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "last_error": self.last_error,
+            "last_check": self.last_check,
+            "latency_ms": percentiles(self.latencies),
+            "first_chunk_ms": percentiles(self.first_chunk_latencies)
+        }
+
+
+def percentiles(samples):
+    if not samples:
+        return None
+    values = np.array(samples) * 1000
+    return {
+        "count": len(values),
+        "mean": round(float(values.mean()), 1),
+        "p50": round(float(np.percentile(values, 50)), 1),
+        "p95": round(float(np.percentile(values, 95)), 1)
+    }
+
+
+class OllamaRouter:
+    """
+    Drop-in replacement for OllamaClient that spreads requests over several servers.
+
+    Each backend has its own pooled OllamaClient. A request goes to a
+    healthy backend that has the requested model, chosen by ``strategy``:
+    "least_outstanding" picks the fewest in-flight requests relative to
+    weight, "weighted" runs smooth weighted round robin. A backend is
+    ejected after ``eject_after`` consecutive failures or a failed health
+    check, and re-admitted when a health check (GET /api/tags, which also
+    refreshes its model list) succeeds again. A failed request is retried
+    on the next backend; streams only fail over before their first chunk.
+    Client errors (4xx) are raised as they are, without failover or
+    counting against the backend.
+    If no healthy backend lists the model, any healthy backend is tried,
+    and if every backend is ejected they are all tried anyway, so a single
+    backend behaves like a plain OllamaClient.
+    """
+
+    def __init__(self, backends, model, strategy=LEAST_OUTSTANDING, eject_after=3, health_interval=10.0,
+                 health_timeout=2.0, **client_options):
+        if strategy not in (LEAST_OUTSTANDING, WEIGHTED):
+            raise ValueError(f"Unknown balancing strategy '{strategy}'. Choose '{LEAST_OUTSTANDING}' or '{WEIGHTED}'")
+        self.model = model
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.backends = [Backend(url, weight, OllamaClient(url, model, **client_options)) for url, weight in backends]
+        # Generations the pool can run at once before callers queue for a slot
+        self.max_concurrency = sum(backend.client.max_concurrency for backend in self.backends)
+        self._lock = threading.Lock()
+        self._health_thread = None
+
+    def generate(self, prompt, model=None, format=None, options=None):
+        """Run a non-streaming chat completion on the chosen backend and return the message text."""
+        model = model or self.model
+        error = None
+        for backend in self._candidates(model):
+            started = self._begin(backend)
+            try:
+                text = backend.client.generate(prompt, model, format, options)
+            except OllamaRequestError:
+                # The request itself was rejected (e.g. an unsupported format); another backend would do the same
+                self._end(backend, started, counted=False)
+                raise
+            except OllamaBusyError as e:
+                # Saturated locally, not unhealthy
+                self._end(backend, started, counted=False)
+                error = e
+                continue
+            except OllamaError as e:
+                self._end(backend, started, error=e)
+                error = e
+                continue
+            self._end(backend, started)
+            return text
+        raise error
+
+    def stream(self, prompt, model=None, format=None, options=None):
+        """Stream a chat completion, yielding each decoded chunk from the chosen backend."""
+        model = model or self.model
+        error = None
+        for backend in self._candidates(model):
+            started = self._begin(backend)
+            received = False
+            try:
+                for chunk in backend.client.stream(prompt, model, format, options):
+                    if not received:
+                        received = True
+                        backend.first_chunk_latencies.append(time.perf_counter() - started)
+                    yield chunk
+            except OllamaRequestError:
+                self._end(backend, started, counted=False)
+                raise
+            except OllamaBusyError as e:
+                self._end(backend, started, counted=False)
+                error = e
+            except OllamaError as e:
+                self._end(backend, started, error=e)
+                if received:
+                    raise
+                error = e
+            except BaseException:
+                # Closed by the consumer
+                self._end(backend, started, counted=False)
+                raise
+            else:
+                self._end(backend, started)
+                return
+        raise error
+
+    def _candidates(self, model):
+        """Backends to try in order: the balancer's pick first, then the other eligible ones, least loaded first."""
+        with self._lock:
+            healthy = [backend for backend in self.backends if backend.healthy]
+            pool = [backend for backend in healthy if serves(backend.models, model)] or healthy or self.backends
+            # Only the primary advances the round robin; failover order must not skew the weights
+            primary = self._pick(pool)
+            fallbacks = sorted((backend for backend in pool if backend is not primary), key=load)
+        return [primary, *fallbacks]
+
+    def _pick(self, pool):
+        if self.strategy == WEIGHTED:
+            # Smooth weighted round robin: deterministic, spreads a heavy backend's turns out
+            total = sum(backend.weight for backend in pool)
+            for backend in pool:
+                backend.current_weight += backend.weight
+            chosen = max(pool, key=lambda backend: backend.current_weight)
+            chosen.current_weight -= total
+            return chosen
+        lowest = min(load(backend) for backend in pool)
+        return random.choice([backend for backend in pool if load(backend) == lowest])
+
+    def _begin(self, backend):
+        with self._lock:
+            backend.outstanding += 1
+            backend.requests += 1
+        return time.perf_counter()
+
+    def _end(self, backend, started, error=None, counted=True):
+        """Release a request; uncounted outcomes say nothing about the backend's health or latency."""
+        with self._lock:
+            backend.outstanding -= 1
+            if not counted:
+                return
+            if error is None:
+                backend.latencies.append(time.perf_counter() - started)
+                backend.consecutive_failures = 0
+                return
+            backend.errors += 1
+            backend.consecutive_failures += 1
+            backend.last_error = str(error)
+            if backend.healthy and backend.consecutive_failures >= self.eject_after:
+                self._eject(backend, f"{backend.consecutive_failures} consecutive failures")
+
+    def _eject(self, backend, reason):
+        backend.healthy = False
+        backend.ejected_at = time.time()
+        backend.ejections += 1
+        print(f"Ejected Ollama backend {backend.url}: {reason}")
+
+    def check_health(self):
+        """Probe every backend's /api/tags, ejecting the ones that fail and re-admitting the ones that recover."""
+        for backend in self.backends:
+            try:
+                models = set(backend.client.list_models(timeout=self.health_timeout))
+            except Exception as e:
+                with self._lock:
+                    backend.last_check = time.time()
+                    backend.last_error = str(e)
+                    if backend.healthy:
+                        self._eject(backend, f"health check failed: {e}")
+                continue
+            with self._lock:
+                backend.last_check = time.time()
+                backend.models = models
+                if not backend.healthy:
+                    backend.healthy = True
+                    backend.consecutive_failures = 0
+                    print(f"Re-admitted Ollama backend {backend.url}")
+
+    def start_health_checks(self):
+        """Check health now and then every ``health_interval`` seconds on a background thread."""
+        if self._health_thread is not None or not self.health_interval:
+            return
+
+        def run():
+            while True:
+                self.check_health()
+                time.sleep(self.health_interval)
+
+        self._health_thread = threading.Thread(target=run, name="ollama-health", daemon=True)
+        self._health_thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "default_model": self.model,
+                "backends": [backend.stats() for backend in self.backends]
+            }
+
+    def close(self):
+        for backend in self.backends:
+            backend.client.close()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal stand-in for the Ollama chat API, for local testing and benchmarks
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        # Ollama lists installed models here; used as a cheap health check
+        if self.path == "/api/tags":
+            models = [{"name": name} for name in self.server.models]
+            self._send_json(200, {"models": models})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.server.request_count += 1
+
+        if random.random() < self.server.fail_rate:
+            self._send_json(503, {"error": "stub overloaded"})
+            return
+
+        time.sleep(self.server.delay)
+        content = self.server.reply(payload)
+        tokens = content.split(" ")
+        final = {
+            "model": payload.get("model"),
+            "done": True,
+            "prompt_eval_count": len(payload["messages"][-1]["content"].split()),
+            "eval_count": len(tokens),
+            "eval_duration": int(self.server.token_delay * len(tokens) * 1e9) or 1
+        }
+
+        if not payload.get("stream", True):
+            time.sleep(self.server.token_delay * len(tokens))
+            final["message"] = {"role": "assistant", "content": content}
+            self._send_json(200, final)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            time.sleep(self.server.token_delay)
+            text = token if i == 0 else " " + token
+            self._write_chunk({"model": payload.get("model"), "done": False,
+                               "message": {"role": "assistant", "content": text}})
+        final["message"] = {"role": "assistant", "content": ""}
+        self._write_chunk(final)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, obj):
+        data = (json.dumps(obj) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_json(self, status, obj):
+        data = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def echo_reply(payload):
+    return f"Stub reply from {payload.get('model')} for: {payload['messages'][-1]['content'][:80]}"
+
+
+def start_stub_server(port=0, delay=0.0, token_delay=0.0, fail_rate=0.0,
+                      models=("llama3.2",), reply=echo_reply):
+    """
+    Start a stub Ollama server on a background thread and return it.
+
+    ``server.server_address`` holds the bound port; call ``server.shutdown()``
+    to stop it.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubOllamaHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.token_delay = token_delay
+    server.fail_rate = fail_rate
+    server.models = list(models)
+    server.reply = reply
+    server.request_count = 0
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a stub Ollama server")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds before replying")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds per streamed token")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--models", nargs="+", default=["llama3.2"])
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, args.delay, args.token_delay, args.fail_rate, args.models)
+    print(f"Stub Ollama server listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
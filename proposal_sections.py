@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Section-by-section proposal generation: one independent LLM call per section, assembled in order
+"""
+
+import time
+from concurrent.futures import as_completed
+
+# (key, title, what the section covers) in proposal order, per grant type
+PROPOSAL_SECTIONS = {
+    "COMPANY": (
+        ("executive_summary", "Executive Summary",
+         "A concise overview of the organization, the project, the funding requested and why it fits the grant."),
+        ("organization_background", "Organization Background and Capability",
+         "The organization's history, mission, track record and relevant experience."),
+        ("project_description", "Project Description and Alignment with Grant Objectives",
+         "What the project does, the need it addresses and how it meets the grant's stated objectives."),
+        ("organizational_capacity", "Organizational Capacity and Resources",
+         "Staff, facilities, partners and systems the organization brings to deliver the project."),
+        ("implementation_plan", "Implementation Plan with Roles and Responsibilities",
+         "Phases, milestones and timeline, and who is responsible for each."),
+        ("budget", "Budget and Financial Sustainability",
+         "Main cost categories, how the grant funds will be used, other funding and how the work continues afterwards."),
+        ("expected_outcomes", "Expected Outcomes and Impact Measurement",
+         "Measurable outcomes, indicators and how results will be tracked and reported."),
+        ("risk_management", "Risk Management and Contingency Plans",
+         "Key risks to delivery and how each will be mitigated."),
+        ("conclusion", "Conclusion",
+         "A short closing that restates the project's value and the organization's fit for the grant."),
+    ),
+    "INDIVIDUAL": (
+        ("executive_summary", "Executive Summary",
+         "A concise overview of the applicant, the project, the funding requested and why it fits the grant."),
+        ("personal_background", "Personal Background and Qualifications",
+         "The applicant's education, experience, skills and achievements relevant to the project."),
+        ("project_description", "Project Description and Alignment with Grant Objectives",
+         "What the project does, why it matters and how it meets the grant's stated objectives."),
+        ("personal_capacity", "Personal Capacity and Resources",
+         "Time, tools, mentors, networks and other resources the applicant can draw on."),
+        ("implementation_plan", "Implementation Plan with Timeline",
+         "Phases, milestones and a realistic timeline."),
+        ("budget", "Budget and Financial Plan",
+         "Main costs, how the grant funds will be used and any other funding."),
+        ("expected_outcomes", "Expected Outcomes and Personal Growth",
+         "Concrete outcomes of the project and how it develops the applicant."),
+        ("future_directions", "Future Directions and Sustainability",
+         "How the work continues or grows after the grant period."),
+        ("conclusion", "Conclusion",
+         "A short closing that restates the project's value and the applicant's fit for the grant."),
+    ),
+}
+
+
+def proposal_sections(grant_type):
+    return PROPOSAL_SECTIONS["COMPANY" if grant_type == "COMPANY" else "INDIVIDUAL"]
+
+
+def find_section(grant_type, section):
+    """Resolve a section key or 1-based number to its index, or raise ValueError."""
+    sections = proposal_sections(grant_type)
+    for index, (key, title, _) in enumerate(sections):
+        if str(section) in (key, str(index + 1)):
+            return index
+    raise ValueError(f"Unknown section '{section}'. Choose one of: {', '.join(key for key, _, _ in sections)}")
+
+
+def build_section_prompt(grant_type, index, grant_context, applicant_context, instructions=None):
+    """
+    Prompt for one section.
+
+    Everything up to the section request is identical for every section
+    of a proposal, so the backend can reuse the evaluated prompt prefix
+    between the concurrent calls.
+    """
+    sections = proposal_sections(grant_type)
+    outline = "\n".join(f"        {number}. {title}" for number, (_, title, _) in enumerate(sections, start=1))
+    if grant_type == "COMPANY":
+        writer, applicant, placeholders = (
+            "COMPANY/ORGANIZATION", "Organization",
+            "[ORGANIZATION REPRESENTATIVE NAME], [CONTACT EMAIL]"
+        )
+    else:
+        writer, applicant, placeholders = "INDIVIDUAL", "Individual", "[YOUR NAME], [YOUR EMAIL], [YOUR PHONE NUMBER]"
+
+    _, title, scope = sections[index]
+    extra = f"\n        Additional instructions: {instructions}\n" if instructions else ""
+    return f"""
+        You are an expert grant writer specializing in {writer} grant proposals. You are writing one
+        section of a proposal with these sections:
+{outline}
+
+        IMPORTANT: For any details requiring specific personal information (names, contact details, etc.),
+        use placeholders like {placeholders}, etc. instead of generating fictional personal information.
+
+        Grant Information:
+        ------------------
+        {grant_context}
+        ------------------
+
+        {applicant} Information:
+        ------------------
+        {applicant_context}
+        ------------------
+
+        Write only section {index + 1}, "{title}": {scope}
+        Begin with the heading "## {index + 1}. {title}" and do not write any other section.{extra}
+        """
+
+
+def section_heading(index, title):
+    return f"## {index + 1}. {title}"
+
+
+def normalize_section(index, title, text):
+    """Trim a generated section and make sure it starts with its heading."""
+    text = text.strip()
+    first_line = text.split("\n", 1)[0]
+    if title.lower() not in first_line.lower():
+        text = f"{section_heading(index, title)}\n\n{text}"
+    return text
+
+
+def generate_sections(prompts, generate, executor):
+    """
+    Run ``generate(prompt)`` for every (index, key, title, prompt) on ``executor``.
+
+    The executor is shared by every proposal being generated, so its
+    worker count bounds the section calls of all of them together. Yields
+    a section dict as each call finishes, in completion order. A call
+    that raises yields a section with an ``error`` instead of stopping
+    the others. If the generator is closed early (a streaming client
+    disconnected), sections not yet started are cancelled and the running
+    ones finish in the background instead of being waited for.
+    """
+    def run(index, key, title, prompt):
+        started = time.perf_counter()
+        section = {"index": index, "key": key, "title": title}
+        try:
+            section["content"] = normalize_section(index, title, generate(prompt))
+        except Exception as e:
+            section["content"] = section_heading(index, title)
+            section["error"] = f"{type(e).__name__}: {e}"
+        section["time_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return section
+
+    futures = [executor.submit(run, *item) for item in prompts]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def assemble_proposal(sections):
+    """Join finished sections in proposal order."""
+    return "\n\n".join(section["content"] for section in sorted(sections, key=lambda section: section["index"]))
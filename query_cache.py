@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+In-memory LRU caches for query embeddings, search results and semantically similar answers
+"""
+
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(text):
+    """Case- and whitespace-insensitive form of a query, used as its cache key."""
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+def approximate_size(value):
+    """Rough retained size in bytes of a cached value (arrays, strings and JSON-like containers)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(approximate_size(item) for item in value) + 8 * len(value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count and approximate bytes.
+
+    A ``max_entries`` of 0 disables the cache: every lookup misses and
+    nothing is stored. Hit, miss and eviction counters are kept for stats().
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        if not self.max_entries:
+            return
+        size = approximate_size(key) + approximate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.size_bytes += size
+            while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+                self.evictions += 1
+            self._changed()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+            self._changed()
+
+    def _changed(self):
+        """Called with the lock held whenever entries are added or removed."""
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+class SemanticCache(LRUCache):
+    """
+    LRU cache looked up by embedding similarity rather than exact key.
+
+    Entries are stored under their normalized question with a unit-length
+    copy of its embedding. lookup() returns the value of the most similar
+    entry if its cosine similarity reaches ``threshold``. The similarity
+    matrix is rebuilt lazily after the entries change, so a lookup is one
+    matrix-vector product over at most ``max_entries`` rows.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=512, max_bytes=32 * 1024 * 1024):
+        super().__init__(max_entries, max_bytes)
+        self.threshold = threshold
+        self._matrix = None
+        self._keys = []
+
+    def lookup(self, vector):
+        """Return (key, value, similarity) of the closest entry within the threshold, or None."""
+        unit = _unit(vector)
+        with self._lock:
+            if self._matrix is None and self._entries:
+                self._keys = list(self._entries)
+                self._matrix = np.stack([self._entries[key][0][0] for key in self._keys])
+            if self._matrix is not None:
+                similarities = self._matrix @ unit
+                best = int(np.argmax(similarities))
+                similarity = float(similarities[best])
+                if similarity >= self.threshold:
+                    key = self._keys[best]
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return key, self._entries[key][0][1], similarity
+            self.misses += 1
+            return None
+
+    def add(self, key, vector, value):
+        self.put(key, (_unit(vector), value))
+
+    def _changed(self):
+        self._matrix = None
+
+    def stats(self):
+        return dict(super().stats(), threshold=self.threshold)
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class QueryCaches:
+    """
+    The query-side caches of the search and answer endpoints.
+
+    ``embeddings`` maps a normalized query to its vector and only depends
+    on the embedding model, so it survives index changes. ``results``
+    (search responses) and ``answers`` (semantic answer cache) describe a
+    particular index and are cleared when set_index_version() sees a new
+    version.
+    """
+
+    def __init__(self, embeddings, results, answers):
+        self.embeddings = embeddings
+        self.results = results
+        self.answers = answers
+        self.index_version = None
+        self._lock = threading.Lock()
+
+    def set_index_version(self, version, force=False):
+        """Record the version of the loaded index, dropping results and answers if it changed (or ``force``)."""
+        with self._lock:
+            if version == self.index_version and not force:
+                return
+            self.index_version = version
+        self.results.clear()
+        self.answers.clear()
+
+    def stats(self):
+        return {
+            "index_version": self.index_version,
+            "query_embeddings": self.embeddings.stats(),
+            "search_results": self.results.stats(),
+            "answers": self.answers.stats()
+        }
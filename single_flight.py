@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescing of identical in-flight calls and streams onto a single upstream execution
+"""
+
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SharedStream:
+    """
+    One upstream iterator fanned out to every subscriber.
+
+    A background thread drains the upstream into a buffer; each subscriber
+    replays the buffer from the start and then follows it live, so a late
+    joiner sees the whole stream. If every subscriber leaves early the
+    upstream is closed after its next chunk.
+    """
+
+    def __init__(self, on_finish):
+        self.chunks = []
+        self.finished = False
+        self.abandoned = False
+        self.error = None
+        self.subscribers = 0
+        self._condition = threading.Condition()
+        self._on_finish = on_finish
+
+    def start(self, source):
+        threading.Thread(target=self._pump, args=(source,), name="shared-stream", daemon=True).start()
+
+    def _pump(self, source):
+        iterator = None
+        try:
+            iterator = iter(source())
+            for chunk in iterator:
+                with self._condition:
+                    self.chunks.append(chunk)
+                    self._condition.notify_all()
+                    if not self.subscribers:
+                        self.abandoned = True
+                        break
+        except Exception as e:
+            self.error = e
+        finally:
+            if iterator is not None and hasattr(iterator, "close"):
+                iterator.close()
+            # Later callers start a new upstream call rather than joining a finished one
+            self._on_finish(self)
+            with self._condition:
+                self.finished = True
+                self._condition.notify_all()
+
+    def subscribe(self):
+        position = 0
+        try:
+            while True:
+                with self._condition:
+                    while position >= len(self.chunks) and not self.finished:
+                        self._condition.wait()
+                    if position >= len(self.chunks):
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    chunk = self.chunks[position]
+                position += 1
+                yield chunk
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent work by key.
+
+    do() runs ``fn`` once per key at a time; callers arriving while it
+    runs wait and receive the same result (or exception). stream() does
+    the same for iterators: concurrent callers share one upstream stream.
+    Nothing is remembered once a call finishes, so this never serves stale
+    results; pair it with a cache for that. Counters report how many calls
+    ran upstream and how many were coalesced onto them.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self.calls = 0
+        self.coalesced_calls = 0
+        self.streams = 0
+        self.coalesced_streams = 0
+
+    def do(self, key, fn):
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced_calls += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn()
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, source):
+        """Iterate ``source()``, sharing one upstream iteration among concurrent callers with the same key."""
+        if not self.enabled:
+            return source()
+
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is not None:
+                with shared._condition:
+                    # An abandoned stream stops short of the end; joining it would truncate this caller too
+                    if shared.abandoned:
+                        shared = None
+                    else:
+                        shared.subscribers += 1
+            start = shared is None
+            if start:
+                shared = self._streams[key] = SharedStream(lambda finished: self._release(key, finished))
+                shared.subscribers = 1
+                self.streams += 1
+            else:
+                self.coalesced_streams += 1
+
+        if start:
+            shared.start(source)
+        return shared.subscribe()
+
+    def _release(self, key, shared):
+        with self._lock:
+            if self._streams.get(key) is shared:
+                del self._streams[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "calls": self.calls,
+                "coalesced_calls": self.coalesced_calls,
+                "streams": self.streams,
+                "coalesced_streams": self.coalesced_streams,
+                "in_flight_calls": len(self._calls),
+                "in_flight_streams": len(self._streams)
+            }
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+In-process BM25 inverted index and reciprocal rank fusion for hybrid search
+"""
+
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+BM25_FILE = "bm25.npz"
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class BM25Index:
+    """
+    BM25 over the same chunks, in the same order, as the FAISS index.
+
+    Postings are stored as flat NumPy arrays (term offsets, chunk positions,
+    weights). Each posting's weight already folds in idf, term frequency
+    and length normalization, since none of those depend on the query, so
+    scoring a query is one vectorized add per query term.
+    """
+
+    def __init__(self, vocab, offsets, postings, weights, size):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+        self.size = size
+
+    @classmethod
+    def from_texts(cls, texts, k1=1.5, b=0.75):
+        term_postings = {}
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for position, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[position] = sum(counts.values())
+            for term, tf in counts.items():
+                term_postings.setdefault(term, []).append((position, tf))
+
+        size = len(texts)
+        average_length = float(lengths.mean()) if size else 0.0
+        vocab = {}
+        offsets = [0]
+        postings, weights = [], []
+
+        for term, hits in term_postings.items():
+            vocab[term] = len(vocab)
+            positions = np.array([position for position, _ in hits], dtype=np.int32)
+            tf = np.array([count for _, count in hits], dtype=np.float32)
+            idf = np.log(1.0 + (size - len(hits) + 0.5) / (len(hits) + 0.5))
+            norm = k1 * (1.0 - b + b * lengths[positions] / (average_length or 1.0))
+            postings.append(positions)
+            weights.append((idf * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32))
+            offsets.append(offsets[-1] + len(hits))
+
+        return cls(
+            vocab,
+            np.array(offsets, dtype=np.int64),
+            np.concatenate(postings) if postings else np.zeros(0, dtype=np.int32),
+            np.concatenate(weights) if weights else np.zeros(0, dtype=np.float32),
+            size
+        )
+
+    @classmethod
+    def from_faiss(cls, db):
+        """Build from a LangChain FAISS store, in FAISS position order."""
+        texts = [
+            db.docstore.search(db.index_to_docstore_id[position]).page_content
+            for position in range(db.index.ntotal)
+        ]
+        return cls.from_texts(texts)
+
+    def search(self, query, k, bitmap=None):
+        """
+        Return up to ``k`` (position, score) pairs, best first.
+
+        ``bitmap`` is an optional packed little-endian filter bitmap as
+        produced by grant_filters.MetadataIndex.
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores[self.postings[start:end]] += self.weights[start:end]
+
+        if bitmap is not None:
+            scores *= np.unpackbits(bitmap, bitorder="little", count=self.size)
+
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(position), float(scores[position])) for position in ranked]
+
+    def save(self, index_path):
+        terms = np.array(sorted(self.vocab, key=self.vocab.get), dtype=str)
+        np.savez(
+            os.path.join(index_path, BM25_FILE),
+            terms=terms,
+            offsets=self.offsets,
+            postings=self.postings,
+            weights=self.weights,
+            size=np.array(self.size)
+        )
+
+    @classmethod
+    def load(cls, index_path):
+        path = os.path.join(index_path, BM25_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            vocab = {str(term): term_id for term_id, term in enumerate(data["terms"])}
+            return cls(vocab, data["offsets"], data["postings"], data["weights"], int(data["size"]))
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several best-first rankings of positions with RRF.
+
+    Each position scores sum(1 / (k + rank)) over the rankings it appears
+    in. Returns (position, score) pairs, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking, start=1):
+            fused[position] = fused.get(position, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite-backed docstore for the FAISS index, replacing LangChain's pickled index.pkl
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+from langchain.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+DOCSTORE_FILE = "docstore.sqlite3"
+
+# Let SQLite memory-map up to this much of the file instead of copying pages into its cache
+MMAP_SIZE = 1 << 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    page_content TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    position INTEGER PRIMARY KEY,
+    doc_id TEXT NOT NULL
+);
+"""
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    Docstore that fetches chunks from SQLite by ID on demand.
+
+    Opening it costs the same whatever the corpus size, nothing is
+    unpickled, and only the rows a query touches are read (through the
+    OS page cache via mmap), so worker memory does not grow with the
+    corpus text.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            self._local.conn = conn
+        return conn
+
+    def search(self, search):
+        row = self.connection().execute(
+            "SELECT page_content, metadata FROM documents WHERE doc_id = ?", (search,)
+        ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts):
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                "INSERT INTO documents (doc_id, page_content, metadata) VALUES (?, ?, ?)",
+                [(doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False))
+                 for doc_id, doc in texts.items()]
+            )
+
+    def delete(self, ids):
+        conn = self.connection()
+        with conn:
+            conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(doc_id,) for doc_id in ids])
+
+    def __len__(self):
+        return self.connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def iter_metadata(self):
+        """Yield (position, doc_id, metadata) in FAISS position order without loading page contents."""
+        rows = self.connection().execute(
+            "SELECT p.position, p.doc_id, d.metadata FROM positions p JOIN documents d ON d.doc_id = p.doc_id "
+            "ORDER BY p.position"
+        )
+        for position, doc_id, metadata in rows:
+            yield position, doc_id, json.loads(metadata)
+
+
+class SQLitePositionMap(MutableMapping):
+    """FAISS position -> docstore ID mapping kept in the same SQLite file."""
+
+    def __init__(self, docstore):
+        self.docstore = docstore
+
+    def __getitem__(self, position):
+        row = self.docstore.connection().execute(
+            "SELECT doc_id FROM positions WHERE position = ?", (int(position),)
+        ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __setitem__(self, position, doc_id):
+        conn = self.docstore.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO positions (position, doc_id) VALUES (?, ?)", (int(position), doc_id)
+            )
+
+    def update(self, other=(), **kwargs):
+        conn = self.docstore.connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO positions (position, doc_id) VALUES (?, ?)",
+                [(int(position), doc_id) for position, doc_id in dict(other, **kwargs).items()]
+            )
+
+    def __delitem__(self, position):
+        conn = self.docstore.connection()
+        with conn:
+            if conn.execute("DELETE FROM positions WHERE position = ?", (int(position),)).rowcount == 0:
+                raise KeyError(position)
+
+    def __iter__(self):
+        rows = self.docstore.connection().execute("SELECT position FROM positions ORDER BY position")
+        for (position,) in rows:
+            yield position
+
+    def __len__(self):
+        return self.docstore.connection().execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+
+def write_docstore(path, index_to_docstore_id, docstore, batch_size=1000):
+    """
+    Write every chunk referenced by a FAISS store to a new SQLite docstore.
+
+    The file is written next to ``path`` and swapped in atomically, so
+    readers never see a half-written store. The store uses a rollback
+    journal rather than WAL so that swapping the file never leaves a
+    stale -wal file behind.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+    documents, positions = [], []
+
+    def flush():
+        conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", documents)
+        conn.executemany("INSERT INTO positions VALUES (?, ?)", positions)
+        documents.clear()
+        positions.clear()
+
+    for position, doc_id in index_to_docstore_id.items():
+        doc = docstore.search(doc_id)
+        documents.append((doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False)))
+        positions.append((int(position), doc_id))
+        if len(positions) >= batch_size:
+            flush()
+    flush()
+
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, path)
+
+
+def load_docstore(index_path):
+    """Open the SQLite docstore in an index directory, or return None if it has none."""
+    path = os.path.join(index_path, DOCSTORE_FILE)
+    if not os.path.exists(path):
+        return None
+    docstore = SQLiteDocstore(path)
+    return docstore, SQLitePositionMap(docstore)
+
+
+def migrate_pickle_docstore(index_path):
+    """Convert an index directory's LangChain index.pkl into a SQLite docstore."""
+    import pickle
+
+    with open(os.path.join(index_path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    write_docstore(os.path.join(index_path, DOCSTORE_FILE), index_to_docstore_id, docstore)
+    print(f"Wrote {len(index_to_docstore_id)} chunks to {os.path.join(index_path, DOCSTORE_FILE)}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    migrate_pickle_docstore(sys.argv[1] if len(sys.argv) > 1 else "grants_faiss_index")
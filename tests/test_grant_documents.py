@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import grant_documents
+
+GRANTS = [
+    {
+        "program_id": i,
+        "program_name": f"Program {i} \"Innovation\" café ☃",
+        "for_profit": i % 2 == 0,
+        "incorporated": False,
+        "max_funding": None,
+        "amount": 1250.75 * i,
+        "rate": -1.5e-3,
+        "tags": [1, 2.0, {"nested": True}],
+    }
+    for i in range(12)
+]
+
+
+def read_all(path):
+    errors = []
+    grants = list(grant_documents.iter_grants(path, lambda *error: errors.append(error)))
+    return grants, errors
+
+
+@pytest.fixture
+def grants_file(tmp_path):
+    path = tmp_path / "grants.json"
+    # ASCII escapes put \uXXXX sequences in the file, so splits land inside them too
+    path.write_text(json.dumps(GRANTS, ensure_ascii=True), encoding="utf-8")
+    return path
+
+
+def test_array_split_at_every_buffer_boundary(grants_file, monkeypatch):
+    record_length = len(json.dumps(GRANTS[0], ensure_ascii=True))
+    for read_size in range(1, 2 * record_length):
+        monkeypatch.setattr(grant_documents, "READ_SIZE", read_size)
+        grants, errors = read_all(grants_file)
+        assert errors == [], f"READ_SIZE={read_size}"
+        assert grants == GRANTS, f"READ_SIZE={read_size}"
+
+
+def test_malformed_record_is_skipped(tmp_path, monkeypatch):
+    records = [json.dumps(grant) for grant in GRANTS[:3]]
+    records[1] = records[1].replace('"incorporated": false', '"incorporated": flase')
+    path = tmp_path / "grants.json"
+    path.write_text("[" + ", ".join(records) + "]", encoding="utf-8")
+
+    for read_size in (7, 64, 1 << 20):
+        monkeypatch.setattr(grant_documents, "READ_SIZE", read_size)
+        grants, errors = read_all(path)
+        assert grants == [GRANTS[0], GRANTS[2]]
+        assert [error[0] for error in errors] == [2]
+
+
+def test_malformed_record_with_nested_objects(tmp_path, monkeypatch):
+    # Commas and brackets inside the bad record's nested arrays, objects and strings are not record boundaries
+    bad = '{"program_id": 99, "for_profit": tru, "tags": [{"a": 1}, {"b": 2}], "note": "x\\"], {"}'
+    path = tmp_path / "grants.json"
+    path.write_text("[" + ", ".join([json.dumps(GRANTS[0]), bad, *map(json.dumps, GRANTS[1:4])]) + "]", encoding="utf-8")
+
+    for read_size in (1, 7, 64, 1 << 20):
+        monkeypatch.setattr(grant_documents, "READ_SIZE", read_size)
+        grants, errors = read_all(path)
+        assert grants == GRANTS[:4], f"READ_SIZE={read_size}"
+        assert [error[0] for error in errors] == [2]
+
+
+def test_malformed_last_record(tmp_path):
+    path = tmp_path / "grants.json"
+    path.write_text("[" + json.dumps(GRANTS[0]) + ', {"tags": [{"a": 1}, {"b": nul}]}]', encoding="utf-8")
+    grants, errors = read_all(path)
+    assert grants == GRANTS[:1]
+    assert len(errors) == 1
+
+
+def test_ndjson(tmp_path):
+    path = tmp_path / "grants.ndjson"
+    path.write_text("\n".join(json.dumps(grant) for grant in GRANTS) + "\n", encoding="utf-8")
+    grants, errors = read_all(path)
+    assert grants == GRANTS
+    assert errors == []
@@ -0,0 +1,74 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+from ollama_stub import start_stub_server
+
+GRANT_CONTENT = """
+Program Name: Youth Research Fellowship
+Description: Supports students under 30 pursuing research projects.
+Target Audience: Student, Youth
+Location: Alberta
+"""
+
+
+def reply(payload):
+    # The structured eligibility call asks for JSON; everything else gets plain text
+    if payload.get("format") is not None:
+        return json.dumps({"grant_type": "INDIVIDUAL", "eligibility_points": ["Under 30", "Lives in Alberta"]})
+    prompt = payload["messages"][-1]["content"]
+    if "yes/no question" in prompt:
+        return "1. Are you under 30?\n2. Do you live in Alberta?"
+    return "- Under 30\n- Lives in Alberta"
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    work = tmp_path_factory.mktemp("app")
+    stub = start_stub_server(reply=reply)
+    previous_cwd, previous_env = os.getcwd(), dict(os.environ)
+    os.chdir(work)
+    os.environ.update(
+        STARTUP_MODE="lazy",
+        OLLAMA_API=f"http://127.0.0.1:{stub.server_address[1]}/api/chat",
+        OLLAMA_HEALTH_INTERVAL="0",
+        LLM_CACHE_PATH=str(work / "llm_cache.sqlite3"),
+        JOB_STORE_PATH=str(work / "jobs.sqlite3")
+    )
+    sys.modules.pop("App", None)
+    try:
+        app_module = importlib.import_module("App")
+        app_module.job_queue.stop()
+        yield app_module, app_module.app.test_client()
+    finally:
+        os.chdir(previous_cwd)
+        os.environ.clear()
+        os.environ.update(previous_env)
+        stub.shutdown()
+
+
+def test_questions_from_grant_content(client):
+    _, test_client = client
+    response = test_client.post("/api/questions", json={"grant_content": GRANT_CONTENT})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["grant_type"] == "INDIVIDUAL"
+    assert data["questions"].startswith("1. Are you under 30?")
+
+
+def test_questions_from_precomputed_insights(client, monkeypatch):
+    app_module, test_client = client
+    monkeypatch.setattr(app_module, "lookup_insights", lambda program_id: {
+        "grant_type": "INDIVIDUAL", "eligibility_points": "- Under 30\n- Lives in Alberta"
+    } if program_id == "42" else None)
+    response = test_client.post("/api/questions", json={"grant_content": GRANT_CONTENT, "program_id": "42"})
+    assert response.status_code == 200
+    assert "Do you live in Alberta?" in response.get_json()["questions"]
+
+
+def test_questions_require_grant_content(client):
+    _, test_client = client
+    assert test_client.post("/api/questions", json={}).status_code == 400
@@ -6,6 +6,7 @@ import pickle
 import json
 from flask_cors import CORS
 import traceback
+from sqlite_docstore import DOCSTORE_FILE, SQLiteDocstore
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -535,15 +536,13 @@ def load_vectors():
     """Load and return basic information about the vector database"""
     try:
         # Check if index exists
-        if not os.path.exists(f"{INDEX_PATH}/index.faiss") or not os.path.exists(f"{INDEX_PATH}/index.pkl"):
+        has_docstore = os.path.exists(f"{INDEX_PATH}/{DOCSTORE_FILE}")
+        if not os.path.exists(f"{INDEX_PATH}/index.faiss") or \
+                not (has_docstore or os.path.exists(f"{INDEX_PATH}/index.pkl")):
             return jsonify({
                 'error': 'Vector database files not found. Please check the directory path.'
             }), 404
         
-        # Load the pickle file
-        with open(f"{INDEX_PATH}/index.pkl", "rb") as f:
-            data = pickle.load(f)
-        
         # Load the FAISS index
         index = faiss.read_index(f"{INDEX_PATH}/index.faiss")
         
@@ -561,17 +560,27 @@ def load_vectors():
                 vector_dim = 'unknown'
         
         # Get metadata if available
+        if has_docstore:
+            # Read only the metadata column, in FAISS position order
+            docstore = SQLiteDocstore(f"{INDEX_PATH}/{DOCSTORE_FILE}")
+            docs = [(doc_id, doc_metadata) for _, doc_id, doc_metadata in docstore.iter_metadata()]
+        else:
+            # Legacy layout: the pickled (docstore, index_to_docstore_id) tuple
+            with open(f"{INDEX_PATH}/index.pkl", "rb") as f:
+                data = pickle.load(f)
+            docstore = data[0] if isinstance(data, tuple) else getattr(data, "docstore", None)
+            docs = [(doc_id, doc.metadata) for doc_id, doc in getattr(docstore, "_dict", {}).items()]
+
         metadata = []
-        if hasattr(data, "docstore") and hasattr(data.docstore, "_dict"):
-            for doc_id, doc in data.docstore._dict.items():
-                metadata.append({
-                    'id': str(doc_id),
-                    'program_name': doc.metadata.get('program_name', 'Unknown'),
-                    'program_status': doc.metadata.get('program_status', 'Unknown'),
-                    'main_industry': doc.metadata.get('main_industry', 'Unknown'),
-                    'location': doc.metadata.get('location', 'Unknown'),
-                    'target_audience': doc.metadata.get('target_audience', 'Unknown')
-                })
+        for doc_id, doc_metadata in docs:
+            metadata.append({
+                'id': str(doc_id),
+                'program_name': doc_metadata.get('program_name', 'Unknown'),
+                'program_status': doc_metadata.get('program_status', 'Unknown'),
+                'main_industry': doc_metadata.get('main_industry', 'Unknown'),
+                'location': doc_metadata.get('location', 'Unknown'),
+                'target_audience': doc_metadata.get('target_audience', 'Unknown')
+            })
         
         return jsonify({
             'vector_count': vector_count,
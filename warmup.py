@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Lazy, optionally backgrounded loading of the server's heavy components
+"""
+
+import threading
+import time
+import traceback
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class Component:
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.state = PENDING
+        self.value = None
+        self.error = None
+        self.started_at = None
+        self.seconds = None
+        self.lock = threading.Lock()
+
+
+class Warmup:
+    """
+    Registry of named components that load on first use or in the background.
+
+    Each component loads at most once; concurrent callers block on the same
+    per-component lock rather than loading twice. A failed load is
+    retried on the next access, so a transient error (e.g. the index
+    still being written) does not poison the process.
+    """
+
+    def __init__(self):
+        self.components = {}
+        self.started = time.time()
+        self._thread = None
+
+    def register(self, name, loader):
+        """Register a loader and return a proxy that loads it on first attribute access."""
+        self.components[name] = Component(name, loader)
+        return LazyProxy(self, name)
+
+    def get(self, name):
+        component = self.components[name]
+        if component.state == READY:
+            return component.value
+
+        with component.lock:
+            if component.state != READY:
+                component.state = LOADING
+                component.started_at = time.perf_counter()
+                try:
+                    component.value = component.loader()
+                except Exception as e:
+                    component.state = FAILED
+                    component.error = f"{type(e).__name__}: {e}"
+                    traceback.print_exc()
+                    raise
+                component.seconds = round(time.perf_counter() - component.started_at, 3)
+                component.error = None
+                component.state = READY
+                print(f"Loaded {name} in {component.seconds}s")
+        return component.value
+
+    def reset(self, *names):
+        """Forget loaded values so the next access (or warm-up) loads them again."""
+        for name in names:
+            component = self.components[name]
+            with component.lock:
+                component.state = PENDING
+                component.value = None
+                component.error = None
+                component.seconds = None
+
+    def load_all(self):
+        for name in self.components:
+            try:
+                self.get(name)
+            except Exception:
+                # Already recorded on the component; keep warming the rest
+                pass
+
+    def start(self, background=True):
+        """Load every component in registration order, on a daemon thread if ``background``."""
+        if not background:
+            self.load_all()
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.load_all, name="warmup", daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self):
+        return all(component.state == READY for component in self.components.values())
+
+    def status(self):
+        components = {}
+        for name, component in self.components.items():
+            entry = {"state": component.state}
+            if component.state == READY:
+                entry["seconds"] = component.seconds
+            elif component.state == LOADING:
+                entry["elapsed"] = round(time.perf_counter() - component.started_at, 3)
+            elif component.state == FAILED:
+                entry["error"] = component.error
+            components[name] = entry
+
+        done = sum(1 for component in self.components.values() if component.state == READY)
+        return {
+            "ready": self.ready,
+            "progress": f"{done}/{len(self.components)}",
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "components": components
+        }
+
+
+class LazyProxy:
+    """Stand-in for a component that loads it through the registry on first use."""
+
+    def __init__(self, warmup, name):
+        object.__setattr__(self, "_warmup", warmup)
+        object.__setattr__(self, "_name", name)
+
+    def _target(self):
+        return self._warmup.get(self._name)
+
+    def __getattr__(self, attr):
+        return getattr(self._target(), attr)
+
+    def __len__(self):
+        return len(self._target())
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __contains__(self, item):
+        return item in self._target()
+
+    def __getitem__(self, key):
+        return self._target()[key]
+
+    def __repr__(self):
+        component = self._warmup.components[self._name]
+        return f"<LazyProxy {self._name} ({component.state})>"